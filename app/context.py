@@ -1,23 +1,40 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+from itertools import count
 from pathlib import Path
+from threading import Lock
+import heapq
 import json
 import logging
 import re
+import sqlite3
 import subprocess
 
 from app import utils
+from app.manifest import EMPTY_MANIFEST, MODEL_TYPES, ManifestIndex, ManifestNode, load_manifest_index
 from app.rag import (
     extract_error_signals,
     extract_macro_calls,
+    indexed_relevance_score,
     node_symbols,
     relevance_score,
     structured_sql_context,
 )
+from app.symbol_index import SymbolIndex
 
-MODEL_TYPES = {"model", "snapshot", "seed"}
 MAX_DIAGNOSTIC_MODELS = 6
 MAX_IMPACT_MODELS = 5
 MAX_UPSTREAM_DEPTH = 2
 MAX_DOWNSTREAM_DEPTH = 2
+LINEAGE_TOKEN_BUDGET = 12_000
+LINEAGE_FANOUT = 12
+LINEAGE_DEPTH_PENALTY = 2
+ESTIMATED_CHARS_PER_TOKEN = 4
+IMPACT_COUNT_DEPTH = 5
+MAX_DIFF_CHARS = 20_000
+DIFF_HEADER_RE = re.compile(r"^(?=diff --git )", re.MULTILINE)
 COMPILED_SQL_RE = re.compile(r"compiled code at\s+(?P<path>target/[^\s]+\.sql)", re.IGNORECASE)
 ERROR_LOCATION_RE = re.compile(r"\b(?:line|LINE)\s+\d+|\[\d+:\d+\]")
 COLUMN_ERROR_RE = re.compile(
@@ -26,8 +43,81 @@ COLUMN_ERROR_RE = re.compile(
 )
 
 
-def _read_source_text(path: Path) -> str:
-    """Read source file with utf-8 fallback."""
+class SourceCache:
+    def __init__(self):
+        """Initialize thread-safe cache of source texts and node symbols keyed by path and stat."""
+        self._texts: dict[tuple, Future] = {}
+        self._symbols: dict[tuple, Future] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(path: Path) -> tuple | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _memo(self, store: dict[tuple, Future], key: tuple, compute):
+        with self._lock:
+            future = store.get(key)
+            owner = future is None
+            if owner:
+                future = store[key] = Future()
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as exc:
+                future.set_exception(exc)
+        return future.result()
+
+    def text(self, path: Path) -> str:
+        """Return source text, reading the file only when it is new or changed."""
+        key = self._key(path)
+        if key is None:
+            return ""
+        return self._memo(self._texts, key, lambda: _read_file_text(path))
+
+    def symbols(self, name: str, relative_path: str, path: Path) -> set[str]:
+        """Return node symbols of a source file, extracting them once per file version."""
+        key = self._key(path)
+        if key is None:
+            return node_symbols(name, relative_path, "")
+        return self._memo(
+            self._symbols,
+            (*key, name, relative_path),
+            lambda: node_symbols(name, relative_path, self.text(path)),
+        )
+
+
+source_cache: ContextVar[SourceCache | None] = ContextVar("source_cache", default=None)
+
+
+@contextmanager
+def track_source_cache():
+    """Share one source cache between context builders until the outermost one finishes."""
+    if source_cache.get() is not None:
+        yield source_cache.get()
+        return
+
+    token = source_cache.set(SourceCache())
+    try:
+        yield source_cache.get()
+    finally:
+        source_cache.reset(token)
+
+
+def shares_source_cache(function):
+    """Run context builder inside the source cache of its caller, or a new one."""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with track_source_cache():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def _read_file_text(path: Path) -> str:
     try:
         return path.read_text(encoding="utf-8")
     except UnicodeDecodeError:
@@ -36,6 +126,12 @@ def _read_source_text(path: Path) -> str:
         return ""
 
 
+def _read_source_text(path: Path) -> str:
+    """Read source file with utf-8 fallback."""
+    cache = source_cache.get()
+    return cache.text(path) if cache else _read_file_text(path)
+
+
 def _relative_to_failed_repo(path: Path) -> str:
     """Return path relative to failed repository when possible."""
     try:
@@ -53,36 +149,85 @@ def _git_revision_exists(repo_path: Path, revision: str) -> bool:
     ).returncode == 0
 
 
-def _get_file_diff(path: Path) -> str:
-    """Return diff for source file against available base revision."""
-    try:
-        failed_repo_path = utils.get_failed_repo_path()
-        relative_path = path.relative_to(failed_repo_path)
-    except (RuntimeError, ValueError):
-        return "NO_DIFF"
-
-    base_revision = next(
+def _diff_base_revision(repo_path: Path) -> str | None:
+    """Return first available base revision to diff failed sources against."""
+    return next(
         (
             revision
             for revision in ("HEAD^", f"origin/{utils.config.base_branch}")
-            if _git_revision_exists(failed_repo_path, revision)
+            if _git_revision_exists(repo_path, revision)
         ),
         None,
     )
+
+
+def _split_diff(diff: str) -> dict[str, str]:
+    """Split combined git diff output into patches keyed by repository path."""
+    patches = {}
+    for patch in DIFF_HEADER_RE.split(diff):
+        header, _, _ = patch.partition("\n")
+        match = re.fullmatch(r"diff --git a/(?P<path>.+) b/(?P=path)", header)
+        if match:
+            patches[match.group("path")] = patch.strip()
+    return patches
+
+
+def _cap_diff(diff: str, max_chars: int = MAX_DIFF_CHARS) -> str:
+    """Truncate diff to max_chars on a line boundary."""
+    if len(diff) <= max_chars:
+        return diff
+    cut = diff.rfind("\n", 0, max_chars)
+    return f"{diff[:cut if cut > 0 else max_chars]}\n... DIFF TRUNCATED ({len(diff) - max_chars} more characters)"
+
+
+def _get_file_diffs(paths: list[Path]) -> dict[Path, str]:
+    """Return diffs of source files against the base revision from one git call."""
+    try:
+        failed_repo_path = utils.get_failed_repo_path()
+    except RuntimeError:
+        return {}
+
+    relative_paths = {}
+    for path in paths:
+        try:
+            relative_paths[path] = path.relative_to(failed_repo_path).as_posix()
+        except ValueError:
+            continue
+    if not relative_paths:
+        return {}
+
+    base_revision = _diff_base_revision(failed_repo_path)
     if not base_revision:
-        return "NO_DIFF"
+        return {}
 
     result = subprocess.run(
-        ["git", "diff", base_revision, "--", relative_path.as_posix()],
+        [
+            "git",
+            "-c",
+            "core.quotePath=false",
+            "diff",
+            "--relative",
+            "--no-ext-diff",
+            "--no-renames",
+            base_revision,
+            "--",
+            *dict.fromkeys(relative_paths.values()),
+        ],
         cwd=failed_repo_path,
         text=True,
+        errors="replace",
         capture_output=True,
     )
     if result.returncode != 0:
-        logging.warning("Unable to get git diff for %s: %s", relative_path, result.stderr.strip())
-        return "NO_DIFF"
+        logging.warning("Unable to get git diff for %s: %s", list(relative_paths.values()), result.stderr.strip())
+        return {}
 
-    return result.stdout.strip() or "NO_DIFF"
+    patches = _split_diff(result.stdout)
+    return {
+        path: _cap_diff(patches[relative_path])
+        for path, relative_path in relative_paths.items()
+        if patches.get(relative_path)
+    }
 
 
 def _error_log() -> str:
@@ -113,97 +258,117 @@ def _context_text(source: str, signals: set[str], query: str) -> str:
     return structured_sql_context(source, signals, query=query)
 
 
-def _read_manifest(failed_repo_path: Path) -> dict:
+def _read_manifest(failed_repo_path: Path) -> ManifestIndex:
+    utils.wait_for_dbt_metadata()
     manifest_path = failed_repo_path / "target" / "manifest.json"
     if not manifest_path.exists():
         logging.warning("dbt manifest not found at %s; skipping lineage context.", manifest_path)
-        return {}
+        return EMPTY_MANIFEST
 
     try:
-        with manifest_path.open(mode="r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_manifest_index(manifest_path, utils.config.manifest_index_dir)
     except (OSError, json.JSONDecodeError) as exc:
         logging.warning("Unable to read dbt manifest at %s: %s", manifest_path, exc)
-        return {}
+        return EMPTY_MANIFEST
 
 
-def _find_node(manifest: dict, file: str) -> tuple[str | None, dict | None]:
-    normalized = file.replace("\\", "/")
-    stem = Path(file).stem
+def _find_test_node(manifest: ManifestIndex, error_log: str) -> tuple[str | None, ManifestNode | None]:
+    name = _test_failure_name(error_log)
+    if not name:
+        return None, None
 
-    for node_id, node in manifest.get("nodes", {}).items():
-        if node.get("resource_type") not in MODEL_TYPES or not node.get("original_file_path"):
-            continue
-        path = node.get("original_file_path", "").replace("\\", "/")
-        if normalized == path or stem in {node.get("name"), Path(path).stem}:
-            return node_id, node
+    return manifest.find_test(name.strip().strip("`'\".,;:()[]{}").split(".")[-1])
 
-    return None, None
 
+def _model_source(failed_repo_path: Path, node: ManifestNode) -> str:
+    return _read_source_text(failed_repo_path / node.original_file_path)
 
-def _find_test_node(manifest: dict, error_log: str) -> tuple[str | None, dict | None]:
-    name = _test_failure_name(error_log)
-    if not name:
-        return None, None
 
-    name = name.strip().strip("`'\".,;:()[]{}").split(".")[-1]
-    for node_id, node in manifest.get("nodes", {}).items():
-        if node.get("resource_type") != "test":
-            continue
-        identifiers = {str(node.get("name") or ""), str(node.get("alias") or "")}
-        if name in identifiers or f".{name}." in node_id or node_id.endswith(f".{name}"):
-            return node_id, node
+def _is_model(manifest: ManifestIndex, node_id: str) -> bool:
+    node = manifest.nodes.get(node_id)
+    return bool(node and node.resource_type in MODEL_TYPES)
 
-    return None, None
 
+def _upstream_model_ids(manifest: ManifestIndex, node_id: str) -> list[str]:
+    return manifest.parent_models(node_id)
 
-def _model_source(failed_repo_path: Path, node: dict) -> str:
-    return _read_source_text(failed_repo_path / node["original_file_path"])
 
+def _downstream_model_ids(manifest: ManifestIndex, node_id: str) -> list[str]:
+    return manifest.child_models(node_id)
 
-def _upstream_model_ids(manifest: dict, node_id: str) -> list[str]:
-    nodes = manifest.get("nodes", {})
-    return [
-        parent_id
-        for parent_id in nodes.get(node_id, {}).get("depends_on", {}).get("nodes", [])
-        if nodes.get(parent_id, {}).get("resource_type") in MODEL_TYPES
-    ]
 
+def _test_model_ids(manifest: ManifestIndex, test_node: ManifestNode | None) -> list[str]:
+    return [dep_id for dep_id in (test_node.depends_on if test_node else ()) if _is_model(manifest, dep_id)]
 
-def _downstream_model_ids(manifest: dict, node_id: str) -> list[str]:
-    nodes = manifest.get("nodes", {})
-    return [
-        child_id
-        for child_id in manifest.get("child_map", {}).get(node_id, [])
-        if nodes.get(child_id, {}).get("resource_type") in MODEL_TYPES
-    ]
 
+def symbol_index() -> SymbolIndex:
+    """Return persistent symbol index of dbt node sources."""
+    return SymbolIndex(utils.config.symbol_index)
 
-def _test_model_ids(manifest: dict, test_node: dict | None) -> list[str]:
-    nodes = manifest.get("nodes", {})
-    return [
-        dep_id
-        for dep_id in (test_node or {}).get("depends_on", {}).get("nodes", [])
-        if nodes.get(dep_id, {}).get("resource_type") in MODEL_TYPES
-    ]
 
+def _model_scores(
+    failed_repo_path: Path,
+    manifest: ManifestIndex,
+    node_ids: list[str],
+    signals: set[str],
+) -> dict[str, int]:
+    nodes = {node_id: manifest.nodes[node_id] for node_id in node_ids}
+    indexed = {node_id: node for node_id, node in nodes.items() if node.checksum}
+    scores = {}
+    if indexed:
+        try:
+            weights = symbol_index().weights(
+                {node.checksum: partial(_model_source, failed_repo_path, node) for node in indexed.values()},
+                signals,
+            )
+            scores = {
+                node_id: indexed_relevance_score(
+                    node.name or "",
+                    node.original_file_path or "",
+                    weights[node.checksum],
+                    signals,
+                )
+                for node_id, node in indexed.items()
+                if node.checksum in weights
+            }
+        except sqlite3.Error as exc:
+            logging.warning("Unable to use symbol index; scoring model sources directly: %s", exc)
+
+    for node_id, node in nodes.items():
+        if node_id not in scores:
+            scores[node_id] = _model_relevance(failed_repo_path, node, signals)
+    return scores
 
-def _ranked_model_ids(failed_repo_path: Path, manifest: dict, node_ids: list[str], signals: set[str]) -> list[str]:
-    return sorted(
-        node_ids,
-        key=lambda node_id: relevance_score(
-            _model_source(failed_repo_path, manifest["nodes"][node_id]),
-            manifest["nodes"][node_id].get("name", ""),
-            manifest["nodes"][node_id].get("original_file_path", ""),
-            signals,
-        ),
-        reverse=True,
+
+def _ranked_model_ids(
+    failed_repo_path: Path,
+    manifest: ManifestIndex,
+    node_ids: list[str],
+    signals: set[str],
+) -> list[tuple[str, int]]:
+    scores = _model_scores(failed_repo_path, manifest, node_ids, signals)
+    return sorted(((node_id, scores[node_id]) for node_id in node_ids), key=lambda item: item[1], reverse=True)
+
+
+def _node_symbols(failed_repo_path: Path, node: ManifestNode) -> set[str]:
+    cache = source_cache.get()
+    if cache:
+        return set(cache.symbols(node.name, node.original_file_path, failed_repo_path / node.original_file_path))
+    return node_symbols(node.name, node.original_file_path, _model_source(failed_repo_path, node))
+
+
+def _model_relevance(failed_repo_path: Path, node: ManifestNode, signals: set[str]) -> int:
+    return relevance_score(
+        _model_source(failed_repo_path, node),
+        node.name or "",
+        node.original_file_path or "",
+        signals,
+        _node_symbols(failed_repo_path, node),
     )
 
 
-def _model_signals(failed_repo_path: Path, manifest: dict, node_id: str) -> set[str]:
-    node = manifest["nodes"][node_id]
-    return node_symbols(node["name"], node["original_file_path"], _model_source(failed_repo_path, node))
+def _model_signals(failed_repo_path: Path, manifest: ManifestIndex, node_id: str) -> set[str]:
+    return _node_symbols(failed_repo_path, manifest.nodes[node_id])
 
 
 def _flat_text(value) -> str:
@@ -214,49 +379,56 @@ def _flat_text(value) -> str:
     return str(value or "")
 
 
-def _test_signals(manifest: dict, test_node: dict | None) -> set[str]:
+def _test_signals(manifest: ManifestIndex, test_node: ManifestNode | None) -> set[str]:
     if not test_node:
         return set()
 
     parts = [
-        test_node.get("name"),
-        test_node.get("column_name"),
-        _flat_text(test_node.get("test_metadata")),
+        test_node.name,
+        test_node.column_name,
+        _flat_text(test_node.test_metadata),
     ]
     for model_id in _test_model_ids(manifest, test_node):
-        node = manifest["nodes"][model_id]
-        parts += [node.get("name"), node.get("alias"), Path(node.get("original_file_path", "")).stem]
+        node = manifest.nodes[model_id]
+        parts += [node.name, node.alias, Path(node.original_file_path or "").stem]
 
     return extract_error_signals(" ".join(str(part or "") for part in parts))
 
 
-def _test_failure_context(manifest: dict, test_node: dict | None) -> str:
+def _test_failure_context(manifest: ManifestIndex, test_node: ManifestNode | None) -> str:
     if not test_node:
         return ""
 
-    metadata = test_node.get("test_metadata") or {}
-    test_type = metadata.get("name") or str(test_node.get("name", "")).split("_", 1)[0]
+    metadata = test_node.test_metadata or {}
+    test_type = metadata.get("name") or str(test_node.name or "").split("_", 1)[0]
     lines = [
-        f"name: {test_node.get('name')}",
+        f"name: {test_node.name}",
         f"type: {test_type}",
-        f"schema_file: {test_node.get('original_file_path')}",
+        f"schema_file: {test_node.original_file_path}",
     ]
-    if test_node.get("column_name"):
-        lines.append(f"column: {test_node.get('column_name')}")
+    if test_node.column_name:
+        lines.append(f"column: {test_node.column_name}")
 
     for key, value in (metadata.get("kwargs") or {}).items():
         lines.append(f"{key}: {value}")
 
     for model_id in _test_model_ids(manifest, test_node):
-        node = manifest["nodes"][model_id]
-        lines.append(f"depends_on_model: {node.get('name')} ({node.get('original_file_path')})")
+        node = manifest.nodes[model_id]
+        lines.append(f"depends_on_model: {node.name} ({node.original_file_path})")
 
     return "<DBT_TEST_FAILURE>\n" + "\n".join(lines) + "\n</DBT_TEST_FAILURE>"
 
 
+def _estimated_tokens(failed_repo_path: Path, node: ManifestNode) -> int:
+    try:
+        return (failed_repo_path / node.original_file_path).stat().st_size // ESTIMATED_CHARS_PER_TOKEN
+    except OSError:
+        return 0
+
+
 def _lineage_model_ids(
     failed_repo_path: Path,
-    manifest: dict,
+    manifest: ManifestIndex,
     root_id: str,
     signals: set[str],
     query: str,
@@ -264,66 +436,69 @@ def _lineage_model_ids(
     max_depth: int,
     max_models: int,
     relevance_after_first: bool = False,
+    token_budget: int = LINEAGE_TOKEN_BUDGET,
 ) -> list[tuple[str, int, set[str], str]]:
     selected = []
     seen = {root_id}
-    queue = [(root_id, 0, signals, query)]
+    frontier = []
+    sequence = count()
 
-    while queue and len(selected) < max_models:
-        parent_id, depth, parent_signals, parent_query = queue.pop(0)
+    def expand(parent_id: str, depth: int, parent_signals: set[str], parent_query: str) -> None:
         if depth >= max_depth:
+            return
+        candidates = [
+            (node_id, score)
+            for node_id, score in _ranked_model_ids(
+                failed_repo_path,
+                manifest,
+                next_ids(manifest, parent_id),
+                parent_signals,
+            )
+            if node_id not in seen and not (relevance_after_first and depth > 0 and score <= 0)
+        ]
+        for node_id, score in candidates[:LINEAGE_FANOUT]:
+            tokens = _estimated_tokens(failed_repo_path, manifest.nodes[node_id])
+            priority = score - LINEAGE_DEPTH_PENALTY * depth
+            # Size only breaks ties between equally relevant models.
+            heapq.heappush(
+                frontier,
+                (-priority, tokens, next(sequence), node_id, depth + 1, parent_signals, parent_query),
+            )
+
+    expand(root_id, 0, signals, query)
+    while frontier and len(selected) < max_models and token_budget > 0:
+        _, tokens, _, node_id, depth, parent_signals, parent_query = heapq.heappop(frontier)
+        # The best model may overrun the budget alone rather than leave the context without lineage.
+        if node_id in seen or (tokens > token_budget and selected):
             continue
 
-        ranked_ids = _ranked_model_ids(
-            failed_repo_path,
-            manifest,
-            next_ids(manifest, parent_id),
-            parent_signals,
+        seen.add(node_id)
+        token_budget -= tokens
+        selected.append((node_id, depth, parent_signals, parent_query))
+        expand(
+            node_id,
+            depth,
+            _model_signals(failed_repo_path, manifest, node_id),
+            _model_source(failed_repo_path, manifest.nodes[node_id]),
         )
-        for node_id in ranked_ids:
-            if node_id in seen:
-                continue
-            node = manifest["nodes"][node_id]
-            if relevance_after_first and depth > 0:
-                score = relevance_score(
-                    _model_source(failed_repo_path, node),
-                    node["name"],
-                    node["original_file_path"],
-                    parent_signals,
-                )
-                if score <= 0:
-                    continue
-
-            seen.add(node_id)
-            selected.append((node_id, depth + 1, parent_signals, parent_query))
-            queue.append(
-                (
-                    node_id,
-                    depth + 1,
-                    _model_signals(failed_repo_path, manifest, node_id),
-                    _model_source(failed_repo_path, node),
-                )
-            )
-            if len(selected) >= max_models:
-                break
 
     return selected
 
 
 def _node_context(
     failed_repo_path: Path,
-    manifest: dict,
+    manifest: ManifestIndex,
     node_id: str,
     signals: set[str],
     label: str,
     depth: int,
     query: str = "",
 ) -> str:
-    node = manifest["nodes"][node_id]
+    node = manifest.nodes[node_id]
     source = _model_source(failed_repo_path, node)
     body = _context_text(source, signals, query)
     return (
-        f"<{label} name=\"{node['name']}\" path=\"{node['original_file_path']}\" depth=\"{depth}\">\n"
+        f"<{label} name=\"{node.name}\" path=\"{node.original_file_path}\" depth=\"{depth}\">\n"
         f"{body}\n"
         f"</{label}>"
     )
@@ -331,8 +506,8 @@ def _node_context(
 
 def _related_test_contexts(
     failed_repo_path: Path,
-    manifest: dict,
-    test_node: dict | None,
+    manifest: ManifestIndex,
+    test_node: ManifestNode | None,
     primary_id: str,
     signals: set[str],
     query: str,
@@ -341,7 +516,7 @@ def _related_test_contexts(
     for index, model_id in enumerate(_test_model_ids(manifest, test_node), start=1):
         if model_id == primary_id:
             continue
-        node = manifest["nodes"][model_id]
+        node = manifest.nodes[model_id]
         contexts[f"test_model_{index}"] = _node_context(
             failed_repo_path,
             manifest,
@@ -370,48 +545,44 @@ def _definition_text(path: Path, signals: set[str], query: str) -> str:
     return compact[:1600].strip()
 
 
-def _macro_contexts(failed_repo_path: Path, manifest: dict, node: dict, source: str, query: str) -> list[str]:
-    macro_ids = list(node.get("depends_on", {}).get("macros", []))
+def _macro_contexts(failed_repo_path: Path, manifest: ManifestIndex, node: ManifestNode, source: str, query: str) -> list[str]:
     macro_names = extract_macro_calls(source)
-
-    for macro_id, macro in manifest.get("macros", {}).items():
-        if macro.get("name") in macro_names:
-            macro_ids.append(macro_id)
+    macro_ids = [*node.depends_on_macros, *manifest.macro_ids(macro_names)]
 
     contexts = []
     for macro_id in list(dict.fromkeys(macro_ids))[:4]:
-        macro = manifest.get("macros", {}).get(macro_id)
-        path = macro.get("original_file_path") if macro else None
+        macro = manifest.macros.get(macro_id)
+        path = macro.original_file_path if macro else None
         if not path:
             continue
         text = _context_text(_read_source_text(failed_repo_path / path), macro_names, query)
-        contexts.append(f"<MACRO_CONTEXT name=\"{macro.get('name')}\" path=\"{path}\">\n{text}\n</MACRO_CONTEXT>")
+        contexts.append(f"<MACRO_CONTEXT name=\"{macro.name}\" path=\"{path}\">\n{text}\n</MACRO_CONTEXT>")
     return contexts
 
 
 def _definition_contexts(
     failed_repo_path: Path,
-    manifest: dict,
-    node: dict,
+    manifest: ManifestIndex,
+    node: ManifestNode,
     error_log: str,
     signals: set[str],
 ) -> list[str]:
     contexts = []
 
-    for source_id in node.get("depends_on", {}).get("nodes", []):
-        source = manifest.get("sources", {}).get(source_id)
-        path = source.get("original_file_path") if source else None
+    for source_id in node.depends_on:
+        source = manifest.sources.get(source_id)
+        path = source.original_file_path if source else None
         if path:
             text = _definition_text(failed_repo_path / path, signals, error_log)
             contexts.append(
-                f"<SOURCE_DEFINITION name=\"{source.get('name')}\" path=\"{path}\">\n"
+                f"<SOURCE_DEFINITION name=\"{source.name}\" path=\"{path}\">\n"
                 f"{text}\n"
                 f"</SOURCE_DEFINITION>"
             )
 
-    for match in utils.exp.DBT_SOURCE_PATH_RE.finditer(error_log):
-        path = utils._normalize_dbt_source_path(match.group("path"))
-        if path and path.endswith((".yml", ".yaml")) and path != node.get("original_file_path"):
+    for raw_path in utils.exp.iter_source_paths(error_log):
+        path = utils._normalize_dbt_source_path(raw_path)
+        if path and path.endswith((".yml", ".yaml")) and path != node.original_file_path:
             text = _definition_text(failed_repo_path / path, signals, error_log)
             if text:
                 contexts.append(
@@ -440,6 +611,7 @@ def _compiled_sql_context(failed_repo_path: Path, error_log: str) -> str:
     return f"<COMPILED_SQL path=\"{path}\"{location_text}>\n{text}\n</COMPILED_SQL>"
 
 
+@shares_source_cache
 def parse_lineage_models(model: str) -> dict[str, str]:
     """Collect selective upstream diagnostic context from manifest."""
     error_log = _error_log()
@@ -451,7 +623,7 @@ def parse_lineage_models(model: str) -> dict[str, str]:
 
     failed_repo_path = utils.get_failed_repo_path()
     manifest = _read_manifest(failed_repo_path)
-    node_id, node = _find_node(manifest, model)
+    node_id, node = manifest.find_model(model)
     if not node_id or not node:
         logging.warning("Model for %s not found in dbt manifest; skipping lineage context.", model)
         return {}
@@ -487,8 +659,8 @@ def parse_lineage_models(model: str) -> dict[str, str]:
         MAX_DIAGNOSTIC_MODELS,
         relevance_after_first=True,
     ):
-        upstream = manifest["nodes"][upstream_id]
-        contexts[upstream["name"]] = _node_context(
+        upstream = manifest.nodes[upstream_id]
+        contexts[upstream.name] = _node_context(
             failed_repo_path,
             manifest,
             upstream_id,
@@ -513,6 +685,13 @@ def parse_lineage_models(model: str) -> dict[str, str]:
     return contexts
 
 
+def _downstream_summary(manifest: ManifestIndex, node_id: str) -> str:
+    counts = manifest.downstream_counts(node_id, IMPACT_COUNT_DEPTH)
+    by_depth = ",".join(f"{depth}:{count}" for depth, count in enumerate(counts, start=1) if count)
+    return f"<DOWNSTREAM_SUMMARY total=\"{sum(counts)}\" by_depth=\"{by_depth}\" />"
+
+
+@shares_source_cache
 def get_impact_context(file: str) -> str:
     """Build downstream context for impact validation."""
     error_log = _error_log()
@@ -521,7 +700,7 @@ def get_impact_context(file: str) -> str:
 
     failed_repo_path = utils.get_failed_repo_path()
     manifest = _read_manifest(failed_repo_path)
-    node_id, node = _find_node(manifest, file)
+    node_id, node = manifest.find_model(file)
     if not node_id or not node:
         return ""
 
@@ -549,6 +728,8 @@ def get_impact_context(file: str) -> str:
             MAX_IMPACT_MODELS,
         )
     ]
+    if sections:
+        sections.insert(0, _downstream_summary(manifest, node_id))
     return "\n".join(sections)
 
 
@@ -568,36 +749,61 @@ def _primary_context_file(file: str, error_log: str) -> str:
     manifest = _read_manifest(failed_repo_path)
     _, test_node = _find_test_node(manifest, error_log)
     for model_id in _test_model_ids(manifest, test_node):
-        return manifest["nodes"][model_id]["original_file_path"]
+        return manifest.nodes[model_id].original_file_path
     return file
 
 
-def get_file_context(files: list[str] | str) -> str:
-    """Build primary source and diagnostic context for files."""
-    sources = []
+def _file_context(path: Path, source: str, diff: str, compiled_sql: str, diagnostic_context: str, impact_context: str) -> str:
+    relative_path = _relative_to_failed_repo(path)
+    return (
+        f"<PRIMARY_ERROR_MODEL path=\"{relative_path}\">\n"
+        f"SOURCE OF {relative_path}:\n{source}\n"
+        f"FILE DIFF:\n{diff}\n"
+        f"{compiled_sql}\n"
+        f"</PRIMARY_ERROR_MODEL>\n\n"
+        f"<DIAGNOSTIC_CONTEXT>\n{diagnostic_context or 'NO_DIAGNOSTIC_CONTEXT'}\n</DIAGNOSTIC_CONTEXT>\n\n"
+        f"<IMPACT_CONTEXT>\n{impact_context or 'NO_IMPACT_CONTEXT'}\n</IMPACT_CONTEXT>"
+    )
 
-    if isinstance(files, str):
-        files = [files]
 
-    for file in files:
-        error_log = _error_log()
-        file = _primary_context_file(file, error_log)
-        path = _file_path(file)
-        if "target" in path.parts or not path.is_file():
-            continue
+def _diagnostic_context(file: str) -> str:
+    return "\n".join(parse_lineage_models(file).values())
+
 
-        relative_path = _relative_to_failed_repo(path)
-        diagnostic_context = "\n".join(parse_lineage_models(file).values())
-        impact_context = get_impact_context(file)
-
-        sources.append(
-            f"<PRIMARY_ERROR_MODEL path=\"{relative_path}\">\n"
-            f"SOURCE OF {relative_path}:\n{_read_source_text(path)}\n"
-            f"FILE DIFF:\n{_get_file_diff(path)}\n"
-            f"{_compiled_sql_context(utils.get_failed_repo_path(), error_log)}\n"
-            f"</PRIMARY_ERROR_MODEL>\n\n"
-            f"<DIAGNOSTIC_CONTEXT>\n{diagnostic_context or 'NO_DIAGNOSTIC_CONTEXT'}\n</DIAGNOSTIC_CONTEXT>\n\n"
-            f"<IMPACT_CONTEXT>\n{impact_context or 'NO_IMPACT_CONTEXT'}\n</IMPACT_CONTEXT>"
+@shares_source_cache
+def get_file_contexts(files: list[str]) -> list[str]:
+    """Build primary source and diagnostic context of each file, empty for files without sources."""
+    error_log = _error_log()
+    files = [_primary_context_file(file, error_log) for file in files]
+    paths = [_file_path(file) for file in files]
+    sources = [(file, path) for file, path in zip(files, paths) if "target" not in path.parts and path.is_file()]
+    if not sources:
+        return [""] * len(files)
+
+    failed_repo_path = utils.get_failed_repo_path()
+    # Lineage and impact builders of every file read the same index; load it before they fan out.
+    _read_manifest(failed_repo_path)
+    gathers = [
+        partial(_get_file_diffs, list(dict.fromkeys(path for _, path in sources))),
+        partial(_compiled_sql_context, failed_repo_path, error_log),
+    ]
+    for file, path in sources:
+        gathers += [partial(_read_source_text, path), partial(_diagnostic_context, file), partial(get_impact_context, file)]
+    diffs, compiled_sql, *pieces = utils.map_concurrently(lambda gather: gather(), gathers)
+
+    contexts = {}
+    for index, (_, path) in enumerate(sources):
+        source, diagnostic_context, impact_context = pieces[index * 3 : index * 3 + 3]
+        contexts[path] = _file_context(
+            path, source, diffs.get(path, "NO_DIFF"), compiled_sql, diagnostic_context, impact_context
         )
+    return [contexts.get(path, "") for path in paths]
+
+
+@shares_source_cache
+def get_file_context(files: list[str] | str) -> str:
+    """Build primary source and diagnostic context for files."""
+    if isinstance(files, str):
+        files = [files]
 
-    return "\n".join(sources)
+    return "\n".join(source for source in get_file_contexts(files) if source)
@@ -0,0 +1,242 @@
+from functools import lru_cache
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from threading import Lock, get_ident
+import logging
+import os
+import re
+import shutil
+import subprocess
+
+DBT_PACKAGE_FILES = ("packages.yml", "package-lock.yml", "dependencies.yml")
+DBT_PARSE_STATE_FILES = ("dbt_project.yml", "profiles.yml", *DBT_PACKAGE_FILES)
+PARTIAL_PARSE_FILE = "partial_parse.msgpack"
+
+
+def dbt_version() -> str:
+    """Return installed dbt-core version."""
+    try:
+        return version("dbt-core")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def files_digest(base: Path, names: tuple[str, ...], *extra: str) -> str | None:
+    """Return content hash of existing files, or None when none exist."""
+    digest = sha256()
+    found = False
+    for name in names:
+        path = base / name
+        if not path.is_file():
+            continue
+        found = True
+        digest.update(name.encode("utf-8") + b"\0" + path.read_bytes() + b"\0")
+    if not found:
+        return None
+    for item in extra:
+        digest.update(item.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def _tree_size(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file() and not item.is_symlink())
+
+
+class DirectoryCache:
+    def __init__(self, root: Path, max_bytes: int):
+        """Initialize content-addressed directory cache with LRU eviction."""
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+
+    def _size_file(self, key: str) -> Path:
+        return self.root / f"{key}.size"
+
+    def _leases(self, key: str) -> Path:
+        return self.root / f"{key}.leases"
+
+    def _link(self, key: str, entry: Path, holder: Path) -> None:
+        leases = self._leases(key)
+        leases.mkdir(parents=True, exist_ok=True)
+        lease = leases / sha256(str(holder).encode("utf-8")).hexdigest()[:16]
+        lease.write_text(str(holder), encoding="utf-8")
+        _link_packages(holder, entry)
+
+    def _pinned(self, key: str) -> bool:
+        """Check whether a holder still links to entry, dropping leases of holders that are gone."""
+        entry = (self.root / key).resolve()
+        pinned = False
+        for lease in self._leases(key).glob("*"):
+            try:
+                holder = Path(lease.read_text(encoding="utf-8"))
+                live = holder.is_symlink() and holder.resolve() == entry
+            except OSError:
+                live = False
+            if live:
+                pinned = True
+            else:
+                lease.unlink(missing_ok=True)
+        return pinned
+
+    def get(self, key: str) -> Path | None:
+        """Return cached entry and mark it as recently used."""
+        entry = self.root / key
+        size_file = self._size_file(key)
+        if not entry.is_dir() or not size_file.exists():
+            return None
+        os.utime(size_file)
+        return entry
+
+    def link(self, key: str, holder: Path) -> Path | None:
+        """Symlink cached entry at holder and pin it against eviction while holder links to it."""
+        with self._lock:
+            entry = self.get(key)
+            if entry:
+                self._link(key, entry, holder)
+            return entry
+
+    def put(self, key: str, source: Path, holder: Path | None = None) -> Path:
+        """Move directory into the cache, link and pin it at holder, and evict least recently used entries."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = self.root / key
+        with self._lock:
+            if self.get(key):
+                if holder:
+                    self._link(key, entry, holder)
+                return entry
+
+            size = _tree_size(source)
+            staging = self.root / f"{key}.tmp-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.move(str(source), staging)
+            try:
+                staging.rename(entry)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not entry.is_dir():
+                    raise
+            self._size_file(key).write_text(str(size), encoding="utf-8")
+            if holder:
+                self._link(key, entry, holder)
+            self._evict(keep=key)
+        return entry
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for size_file in self.root.glob("*.size"):
+            try:
+                entries.append((size_file.stat().st_mtime, size_file.stem, int(size_file.read_text(encoding="utf-8"))))
+            except (OSError, ValueError):
+                continue
+
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep or self._pinned(key):
+                continue
+            logging.info("Evicting cached dbt packages %s (%s bytes)", key, size)
+            self._size_file(key).unlink(missing_ok=True)
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            shutil.rmtree(self._leases(key), ignore_errors=True)
+            total -= size
+
+
+@lru_cache(maxsize=None)
+def get_directory_cache(root: Path, max_bytes: int) -> DirectoryCache:
+    """Return shared cache instance for directory."""
+    return DirectoryCache(root, max_bytes)
+
+
+def _project_setting(dbt_project_path: Path, name: str, default: str) -> str:
+    project_file = dbt_project_path / "dbt_project.yml"
+    text = project_file.read_text(encoding="utf-8") if project_file.is_file() else ""
+    match = re.search(rf"^{re.escape(name)}:\s*['\"]?(?P<value>[^'\"\s#]+)", text, re.MULTILINE)
+    return match.group("value") if match else default
+
+
+def packages_install_path(dbt_project_path: Path) -> Path:
+    """Return dbt packages install directory for project."""
+    return dbt_project_path / _project_setting(dbt_project_path, "packages-install-path", "dbt_packages")
+
+
+def target_path(dbt_project_path: Path) -> Path:
+    """Return dbt target directory for project."""
+    return dbt_project_path / _project_setting(dbt_project_path, "target-path", "target")
+
+
+def _link_packages(target: Path, entry: Path) -> None:
+    if target.is_symlink() or target.is_file():
+        target.unlink()
+    elif target.exists():
+        shutil.rmtree(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.symlink_to(entry, target_is_directory=True)
+
+
+def install_dbt_packages(dbt_project_path: Path, cache: DirectoryCache) -> None:
+    """Link cached dbt packages into project or run dbt deps and cache them."""
+    key = files_digest(dbt_project_path, DBT_PACKAGE_FILES, dbt_version())
+    target = packages_install_path(dbt_project_path)
+
+    if key and cache.link(key, target):
+        logging.info("Using cached dbt packages %s", key)
+        return
+
+    subprocess.run(["dbt", "deps"], cwd=dbt_project_path, check=True)
+    if key and target.is_dir() and not target.is_symlink():
+        cache.put(key, target, holder=target)
+
+
+def _user_profiles_file() -> Path:
+    return Path(os.environ.get("DBT_PROFILES_DIR") or Path.home() / ".dbt") / "profiles.yml"
+
+
+def parse_state_key(dbt_project_path: Path) -> str:
+    """Return hash of inputs that invalidate dbt partial parse state."""
+    profiles = _user_profiles_file()
+    profiles_text = profiles.read_text(encoding="utf-8") if profiles.is_file() else ""
+    return files_digest(dbt_project_path, DBT_PARSE_STATE_FILES, dbt_version(), profiles_text) or ""
+
+
+class PartialParseStore:
+    def __init__(self, root: Path):
+        """Initialize store of dbt partial parse state per project and dbt version."""
+        self.root = root
+
+    def _entry(self, project: str) -> Path:
+        project_id = sha256(project.encode("utf-8")).hexdigest()[:16]
+        return self.root / project_id / dbt_version()
+
+    def restore(self, project: str, dbt_project_path: Path) -> bool:
+        """Copy saved partial parse state into project target when still valid."""
+        entry = self._entry(project)
+        state = entry / PARTIAL_PARSE_FILE
+        key_file = entry / "key"
+        if not state.is_file() or not key_file.is_file():
+            return False
+        if key_file.read_text(encoding="utf-8") != parse_state_key(dbt_project_path):
+            logging.info("dbt project settings changed; discarding saved partial parse state for %s", project)
+            return False
+
+        target = target_path(dbt_project_path)
+        target.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(state, target / PARTIAL_PARSE_FILE)
+        return True
+
+    def save(self, project: str, dbt_project_path: Path) -> None:
+        """Persist partial parse state written by dbt parse."""
+        state = target_path(dbt_project_path) / PARTIAL_PARSE_FILE
+        if not state.is_file():
+            return
+
+        entry = self._entry(project)
+        entry.mkdir(parents=True, exist_ok=True)
+        suffix = f".tmp-{os.getpid()}-{get_ident()}"
+        staged_state = entry / f"{PARTIAL_PARSE_FILE}{suffix}"
+        staged_key = entry / f"key{suffix}"
+        shutil.copyfile(state, staged_state)
+        staged_key.write_text(parse_state_key(dbt_project_path), encoding="utf-8")
+        os.replace(staged_state, entry / PARTIAL_PARSE_FILE)
+        os.replace(staged_key, entry / "key")
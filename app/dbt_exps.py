@@ -1,3 +1,4 @@
+from typing import Iterator
 import re
 
 DBT_SOURCE_DIRS = ("models", "snapshots", "seeds", "analyses", "macros", "tests")
@@ -24,6 +25,9 @@ SQL_CTE_RE = re.compile(r"(?:\bwith|,)\s+([A-Za-z_][\w$]*)\s+as\s*\(", re.IGNORE
 SQL_CONFIG_RE = re.compile(r"{{\s*config\s*\((.*?)\)\s*}}", re.IGNORECASE | re.DOTALL)
 
 
+MAX_LOG_LINE_CHARS = 8192
+
+
 class DbtRegularExpressions:
     def _compile_dbt_log_pattern(pattern: str) -> re.Pattern[str]:
         """Compile dbt log pattern with shared flags."""
@@ -36,37 +40,55 @@ class DbtRegularExpressions:
         (?:Database|Compilation|Runtime|Parsing) \s+ Error \s+ in \s+
         (?:sql \s+)?
         (?P<resource>model|snapshot|seed|macro) \s+
-        (?P<name>[\w.$-]+)
-        (?: \s+ \( (?P<path> [^)\n]+ ) \) )?
+        (?P<name>[\w.$-]++)
+        (?: \s+ \( (?P<path> [^)\n]++ ) \) )?
     """)
     DBT_FAILURE_RE = _compile_dbt_log_pattern(rf"""
         \b Failure \s+ in \s+
         (?P<resource>model|test|snapshot|seed|macro) \s+
-        (?P<name>[\w.$-]+)
-        (?: \s+ \( (?P<path> [^)\n]+ ) \) )?
+        (?P<name>[\w.$-]++)
+        (?: \s+ \( (?P<path> [^)\n]++ ) \) )?
     """)
+    DBT_STATUS_ERROR_RE = _compile_dbt_log_pattern(r"\b ERROR \b")
     DBT_STATUS_MODEL_RE = _compile_dbt_log_pattern(rf"""
-        \b ERROR \b
-        [^\n]*
-        \b model \s+
-        (?P<relation>[A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)?)
+        \b model \s++
+        (?=(?P<relation>[A-Za-z_][\w$]*+(?:\.[A-Za-z_][\w$]*+)?))
     """)
     DBT_NATURAL_MODEL_RE = _compile_dbt_log_pattern(rf"""
         \b error \b
         [^\n]{{0,200}}
-        \b (?:in|for|from) \s+
-        (?:the \s+)?
-        (?P<name>[A-Za-z_][\w$]*) \s+ (?:model|macro) \b
+        \b (?:in|for|from) \s++
+        (?:the \s++)?
+        (?P<name>[A-Za-z_][\w$]*+) \s++ (?:model|macro) \b
     """)
     DBT_SOURCE_PATH_RE = _compile_dbt_log_pattern(rf"""
         (?P<path>
-            (?:[A-Za-z]:)?
-            /?
-            (?:[\w.@+ -]+/)*
-            (?:{"|".join(map(re.escape, DBT_SOURCE_DIRS))})/
-            [\w.@+ /-]+
-            \.
-            (?:{"|".join(re.escape(ext.lstrip(".")) for ext in DBT_SOURCE_EXTENSIONS)})
+            (?P<dir>{"|".join(map(re.escape, DBT_SOURCE_DIRS))})/
+            [\w.@+ /-]*+
         )
     """)
+    DBT_SOURCE_EXTENSION_RE = _compile_dbt_log_pattern(
+        rf"\. (?:{'|'.join(re.escape(ext.lstrip('.')) for ext in DBT_SOURCE_EXTENSIONS)})"
+    )
     DBT_EXPLICIT_ERROR_PATTERNS = (DBT_ERROR_RE, DBT_FAILURE_RE)
+
+    def iter_source_paths(self, text: str) -> Iterator[str]:
+        """Yield dbt source paths, each cut at the last source file extension of its run."""
+        for match in self.DBT_SOURCE_PATH_RE.finditer(text):
+            path = match.group("path")
+            end = None
+            for extension in self.DBT_SOURCE_EXTENSION_RE.finditer(path, len(match.group("dir")) + 2):
+                end = extension.end()
+            if end:
+                yield path[:end]
+
+    def status_model(self, line: str) -> str | None:
+        """Return relation of the last model named after ERROR on a log line."""
+        error = self.DBT_STATUS_ERROR_RE.search(line)
+        if not error:
+            return None
+
+        relation = None
+        for match in self.DBT_STATUS_MODEL_RE.finditer(line, error.end()):
+            relation = match.group("relation")
+        return relation
@@ -0,0 +1,199 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from typing import Iterable
+from uuid import uuid4
+import time
+
+MAX_TRACKED_JOBS = 1000
+JOB_STAGES = ("clone", "deps", "parse", "log_scan", "context", "llm", "push", "notify")
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def _timestamp(value: float | None) -> str | None:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+
+
+@dataclass
+class StageTiming:
+    started_at: float
+    finished_at: float | None = None
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        """Return JSON-serializable stage timing."""
+        return {
+            "started_at": _timestamp(self.started_at),
+            "finished_at": _timestamp(self.finished_at),
+            "seconds": round(self.seconds, 3),
+        }
+
+
+@dataclass
+class Job:
+    repo: str
+    commit_hash: str
+    dbt_path: str
+    workspace: Path | None = None
+    log_path: Path | None = None
+    fingerprint: str | None = None
+    artifacts: dict[str, Path] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid4().hex)
+    state: JobState = JobState.QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    duplicates: int = 0
+    stage: str | None = None
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+    pr_url: str | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Check whether job reached a terminal state."""
+        return self.state in (JobState.SUCCEEDED, JobState.FAILED)
+
+    def to_dict(self) -> dict:
+        """Return JSON-serializable job status."""
+        return {
+            "id": self.id,
+            "repo": self.repo,
+            "commit_hash": self.commit_hash,
+            "dbt_path": self.dbt_path,
+            "artifacts": sorted(self.artifacts),
+            "state": self.state.value,
+            "stage": self.stage,
+            "created_at": _timestamp(self.created_at),
+            "started_at": _timestamp(self.started_at),
+            "finished_at": _timestamp(self.finished_at),
+            "stages": {name: timing.to_dict() for name, timing in list(self.stages.items())},
+            "pr_url": self.pr_url,
+            "error": self.error,
+            "duplicates": self.duplicates,
+        }
+
+
+current_job: ContextVar[Job | None] = ContextVar("current_job", default=None)
+
+
+@contextmanager
+def track_job(job: Job):
+    """Attribute pipeline stages to job."""
+    token = current_job.set(job)
+    try:
+        yield job
+    finally:
+        current_job.reset(token)
+
+
+@contextmanager
+def job_stage(name: str):
+    """Record start, end and duration of a pipeline stage for the current job."""
+    job = current_job.get()
+    if not job:
+        yield
+        return
+
+    started_at = time.time()
+    timing = job.stages.setdefault(name, StageTiming(started_at=started_at))
+    job.stage = name
+    try:
+        yield
+    finally:
+        timing.finished_at = time.time()
+        timing.seconds += timing.finished_at - started_at
+
+
+def normalize_repo(repo: str) -> str:
+    """Return repository URL in a form shared by equivalent spellings."""
+    return repo.strip().lower().removesuffix(".git").rstrip("/")
+
+
+def failure_fingerprint(repo: str, commit_hash: str, error_hashes: Iterable[str]) -> str:
+    """Return stable fingerprint of a CI failure submission."""
+    parts = [normalize_repo(repo), commit_hash.strip().lower(), *sorted(set(error_hashes))]
+    return sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class JobRegistry:
+    def __init__(self, max_jobs: int = MAX_TRACKED_JOBS, dedup_ttl: float = 3600):
+        """Initialize thread-safe in-memory job registry."""
+        self.max_jobs = max_jobs
+        self.dedup_ttl = dedup_ttl
+        self._jobs: dict[str, Job] = {}
+        self._fingerprints: dict[str, str] = {}
+        self._lock = Lock()
+
+    def _duplicate_of(self, job: Job) -> Job | None:
+        """Return in-flight or recently succeeded job with the same fingerprint."""
+        existing = self._jobs.get(self._fingerprints.get(job.fingerprint or "", ""))
+        if not existing or existing.state is JobState.FAILED:
+            return None
+        if existing.finished and time.time() - (existing.finished_at or 0) > self.dedup_ttl:
+            return None
+        return existing
+
+    def add(self, job: Job) -> Job:
+        """Register job or attach it to an existing duplicate."""
+        with self._lock:
+            existing = self._duplicate_of(job)
+            if existing:
+                existing.duplicates += 1
+                return existing
+
+            self._jobs[job.id] = job
+            if job.fingerprint:
+                self._fingerprints[job.fingerprint] = job.id
+            overflow = len(self._jobs) - self.max_jobs
+            for job_id in [job_id for job_id, item in self._jobs.items() if item.finished][:max(overflow, 0)]:
+                self._forget(job_id)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Return job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job and self._fingerprints.get(job.fingerprint or "") == job_id:
+            del self._fingerprints[job.fingerprint]
+
+    def jobs(self, state: JobState | None = None) -> list[Job]:
+        """Return tracked jobs, newest first, optionally filtered by state."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if state is None or job.state is state]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def discard(self, job_id: str) -> None:
+        """Forget job by id."""
+        with self._lock:
+            self._forget(job_id)
+
+    def mark_running(self, job: Job) -> None:
+        """Mark job as picked up by a worker."""
+        with self._lock:
+            job.state = JobState.RUNNING
+            job.started_at = time.time()
+
+    def mark_finished(self, job: Job, error: str | None = None, pr_url: str | None = None) -> None:
+        """Mark job as succeeded or failed."""
+        with self._lock:
+            job.state = JobState.FAILED if error else JobState.SUCCEEDED
+            job.error = error
+            job.pr_url = pr_url
+            job.finished_at = time.time()
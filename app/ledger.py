@@ -0,0 +1,95 @@
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Iterable
+import sqlite3
+import time
+
+LEDGER_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invocations (
+    repo TEXT NOT NULL,
+    invocation TEXT NOT NULL,
+    job_id TEXT,
+    seen_at REAL NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (repo, invocation)
+);
+CREATE INDEX IF NOT EXISTS invocations_seen_at ON invocations (seen_at);
+CREATE INDEX IF NOT EXISTS invocations_job ON invocations (job_id, position);
+"""
+
+
+class ErrorLedger:
+    def __init__(self, path: Path, ttl_seconds: float, max_rows: int):
+        """Initialize SQLite ledger of dbt invocations seen per repository."""
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+
+    @contextmanager
+    def _connect(self, write: bool = False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=LEDGER_TIMEOUT, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def record(self, repo: str, job_id: str | None, invocations: Iterable[str]) -> list[str]:
+        """Store invocations of an uploaded log and return the ones not seen before."""
+        rows = list(dict.fromkeys(item for item in invocations if item))
+        if not rows:
+            return []
+
+        now = time.time()
+        with self._connect(write=True) as conn:
+            placeholders = ",".join("?" * len(rows))
+            seen = {
+                invocation
+                for (invocation,) in conn.execute(
+                    f"SELECT invocation FROM invocations WHERE repo = ? AND invocation IN ({placeholders})",
+                    (repo, *rows),
+                )
+            }
+            conn.executemany(
+                "INSERT INTO invocations (repo, invocation, job_id, seen_at, position) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (repo, invocation) DO UPDATE SET "
+                "job_id = excluded.job_id, seen_at = excluded.seen_at, position = excluded.position",
+                [(repo, invocation, job_id, now, position) for position, invocation in enumerate(rows)],
+            )
+            self._compact(conn, now)
+        return [invocation for invocation in rows if invocation not in seen]
+
+    def latest(self, repo: str, job_id: str | None = None) -> str | None:
+        """Return last invocation recorded by job, or most recent one for repository."""
+        with self._connect() as conn:
+            row = None
+            if job_id:
+                row = conn.execute(
+                    "SELECT invocation FROM invocations WHERE job_id = ? AND repo = ? "
+                    "ORDER BY position DESC LIMIT 1",
+                    (job_id, repo),
+                ).fetchone()
+            if not row:
+                row = conn.execute(
+                    "SELECT invocation FROM invocations WHERE repo = ? "
+                    "ORDER BY seen_at DESC, position DESC LIMIT 1",
+                    (repo,),
+                ).fetchone()
+        return row[0] if row else None
+
+    def _compact(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM invocations WHERE seen_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM invocations").fetchone()
+        if count > self.max_rows:
+            conn.execute(
+                "DELETE FROM invocations WHERE rowid IN "
+                "(SELECT rowid FROM invocations ORDER BY seen_at, position LIMIT ?)",
+                (count - self.max_rows,),
+            )
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from enum import Enum
+from io import StringIO
+from typing import Iterable, Iterator, TextIO
+
+from app.dbt_exps import MAX_LOG_LINE_CHARS, DbtRegularExpressions
+
+exp = DbtRegularExpressions()
+
+LogSource = str | list[str] | TextIO | None
+
+
+class FailureKind(str, Enum):
+    ERROR = "error"
+    FAILURE = "failure"
+    SOURCE_PATH = "source_path"
+    STATUS_MODEL = "status_model"
+    NATURAL_MODEL = "natural_model"
+
+
+EXPLICIT_FAILURE_KINDS = (FailureKind.ERROR, FailureKind.FAILURE)
+FALLBACK_FAILURE_KINDS = (FailureKind.STATUS_MODEL, FailureKind.NATURAL_MODEL)
+
+
+@dataclass(frozen=True)
+class FailureEvent:
+    kind: FailureKind
+    resource: str | None
+    name: str | None
+    path: str | None
+    line: int
+
+
+def _log_lines(source: LogSource) -> Iterable[str]:
+    """Return line iterator over log text, log lines or an open log file."""
+    if source is None:
+        return ()
+    if isinstance(source, str):
+        return StringIO(source)
+    if isinstance(source, list):
+        return StringIO("\n".join(source))
+    return source
+
+
+def _line_events(line: str) -> Iterator[tuple[FailureKind, str | None, str | None, str | None]]:
+    lowered = line.lower()
+    if "error" in lowered:
+        for match in exp.DBT_ERROR_RE.finditer(line):
+            yield FailureKind.ERROR, match.group("resource"), match.group("name"), match.group("path")
+        relation = exp.status_model(line)
+        if relation:
+            yield FailureKind.STATUS_MODEL, None, relation, None
+        for match in exp.DBT_NATURAL_MODEL_RE.finditer(line):
+            yield FailureKind.NATURAL_MODEL, None, match.group("name"), None
+    if "failure" in lowered:
+        for match in exp.DBT_FAILURE_RE.finditer(line):
+            yield FailureKind.FAILURE, match.group("resource"), match.group("name"), match.group("path")
+    if "/" in line:
+        for path in exp.iter_source_paths(line):
+            yield FailureKind.SOURCE_PATH, None, None, path
+
+
+def iter_failure_events(source: LogSource) -> Iterator[FailureEvent]:
+    """Yield dbt failure references from a log in a single pass over its lines."""
+    for number, line in enumerate(_log_lines(source), start=1):
+        line = line[:MAX_LOG_LINE_CHARS]
+        if "\x1b" in line:
+            line = exp.ANSI_ESCAPE_RE.sub("", line)
+        for kind, resource, name, path in _line_events(line):
+            yield FailureEvent(kind=kind, resource=resource, name=name, path=path, line=number)
+
+
+def collect_failure_events(source: LogSource) -> dict[FailureKind, list[FailureEvent]]:
+    """Group failure events by kind, keeping log order within each kind."""
+    events = {kind: [] for kind in FailureKind}
+    for event in iter_failure_events(source):
+        events[event.kind].append(event)
+    return events
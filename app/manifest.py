@@ -0,0 +1,443 @@
+from array import array
+from collections import deque
+from contextlib import closing, contextmanager
+from functools import cached_property, lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Iterator
+import hashlib
+import json
+import logging
+import marshal
+import os
+import posixpath
+import sqlite3
+import sys
+import tempfile
+import time
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = ObjectBuilder = None
+
+from app.dbt_exps import DBT_NODE_RESOURCE_TYPES
+
+MODEL_TYPES = {"model", "snapshot", "seed"}
+MANIFEST_CACHE_SIZE = 4
+MEMO_TIMEOUT = 30
+MEMO_MAX_ROWS = 100_000
+
+MANIFEST_SECTIONS = ("nodes", "sources", "macros")
+INDEX_FILE_MAGIC = b"DBTIDX2\n"
+INDEX_FILE_SUFFIX = f".{sys.implementation.cache_tag}.idx"
+MAX_INDEX_FILES = 32
+MANIFEST_LOAD_LOCKS = 16
+
+_load_locks = tuple(Lock() for _ in range(MANIFEST_LOAD_LOCKS))
+
+MEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest_references (
+    manifest TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    file TEXT,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (manifest, reference)
+);
+CREATE INDEX IF NOT EXISTS manifest_references_used_at ON manifest_references (used_at);
+"""
+
+
+def _normalize_path(path: str) -> str:
+    return path.replace("\\", "/")
+
+
+def _stem(path: str) -> str:
+    return posixpath.splitext(posixpath.basename(path))[0]
+
+
+def _ids(values) -> tuple[str, ...]:
+    return tuple(sys.intern(str(value)) for value in values or ())
+
+
+class ManifestNode:
+    __slots__ = (
+        "resource_type",
+        "name",
+        "alias",
+        "original_file_path",
+        "depends_on",
+        "depends_on_macros",
+        "column_name",
+        "test_metadata",
+        "checksum",
+    )
+
+    def __init__(self, data: dict):
+        """Keep context fields of a manifest entry and drop code, docs and columns."""
+        depends_on = data.get("depends_on") or {}
+        self.resource_type: str | None = data.get("resource_type")
+        self.name: str | None = data.get("name")
+        self.alias: str | None = data.get("alias")
+        self.original_file_path: str | None = data.get("original_file_path")
+        self.depends_on: tuple[str, ...] = _ids(depends_on.get("nodes"))
+        self.depends_on_macros: tuple[str, ...] = _ids(depends_on.get("macros"))
+        self.column_name: str | None = data.get("column_name")
+        self.test_metadata: dict | None = data.get("test_metadata") if self.resource_type == "test" else None
+        self.checksum: str | None = (data.get("checksum") or {}).get("checksum") or None
+
+    @classmethod
+    def from_fields(cls, fields: tuple) -> "ManifestNode":
+        """Restore record from the field tuple stored in an index file."""
+        node = cls.__new__(cls)
+        for slot, value in zip(cls.__slots__, fields):
+            setattr(node, slot, value)
+        return node
+
+    def fields(self) -> tuple:
+        """Return record fields in slot order."""
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+
+class ManifestIndex:
+    def __init__(
+        self,
+        nodes: dict[str, ManifestNode],
+        sources: dict[str, ManifestNode],
+        macros: dict[str, ManifestNode],
+        child_map: dict[str, tuple[str, ...]],
+    ):
+        """Index dbt manifest nodes for constant-time lookups."""
+        self.nodes = nodes
+        self.sources = sources
+        self.macros = macros
+        self.child_map = child_map
+        self._models_by_path: dict[str, tuple[int, str]] = {}
+        self._models_by_stem: dict[str, tuple[int, str]] = {}
+        self._tests_by_name: dict[str, list[str]] = {}
+        self._resource_paths: dict[str, str] = {}
+        self._macros_by_name: dict[str, list[str]] = {}
+
+        for position, (node_id, node) in enumerate(self.nodes.items()):
+            resource_type = node.resource_type
+            if resource_type == "test":
+                names = {str(node.name or ""), str(node.alias or ""), *node_id.split(".")[1:]}
+                for name in names - {""}:
+                    self._tests_by_name.setdefault(name, []).append(node_id)
+                continue
+
+            path = node.original_file_path
+            if resource_type not in DBT_NODE_RESOURCE_TYPES or not path:
+                continue
+            for key in (node.name, node.alias, _stem(path)):
+                if key:
+                    self._resource_paths.setdefault(str(key), path)
+            if resource_type not in MODEL_TYPES:
+                continue
+            path = _normalize_path(path)
+            self._models_by_path.setdefault(path, (position, node_id))
+            for key in (node.name, _stem(path)):
+                if key:
+                    self._models_by_stem.setdefault(key, (position, node_id))
+
+        self._macro_positions = {macro_id: position for position, macro_id in enumerate(self.macros)}
+        macro_paths = {}
+        for macro_id, macro in self.macros.items():
+            if macro.name:
+                self._macros_by_name.setdefault(macro.name, []).append(macro_id)
+            path = macro.original_file_path
+            for key in (macro.name, _stem(path or "")):
+                if path and key:
+                    macro_paths.setdefault(str(key), path)
+        for key, path in macro_paths.items():
+            self._resource_paths.setdefault(key, path)
+
+    @classmethod
+    def from_manifest(cls, manifest: dict) -> "ManifestIndex":
+        """Build index from a parsed manifest."""
+        return cls(
+            *(
+                {sys.intern(key): ManifestNode(value) for key, value in (manifest.get(section) or {}).items()}
+                for section in MANIFEST_SECTIONS
+            ),
+            {sys.intern(key): _ids(value) for key, value in (manifest.get("child_map") or {}).items()},
+        )
+
+    @classmethod
+    def stream(cls, f) -> "ManifestIndex":
+        """Build index from a binary manifest file in one pass without materializing the whole document."""
+        sections = {section: ({}, ManifestNode) for section in MANIFEST_SECTIONS}
+        sections["child_map"] = ({}, _ids)
+        entries = convert = key = builder = None
+        depth = 0
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder:
+                builder.event(event, value)
+                depth += event in ("start_map", "start_array")
+                depth -= event in ("end_map", "end_array")
+                if not depth:
+                    entries[sys.intern(key)] = convert(builder.value)
+                    builder = None
+            elif event == "map_key" and prefix in sections:
+                (entries, convert), key, builder = sections[prefix], value, ObjectBuilder()
+        return cls(*(entries for entries, _ in sections.values()))
+
+    @classmethod
+    def read(cls, path: Path) -> "ManifestIndex":
+        """Load index from a file written by write without parsing the manifest JSON."""
+        data = path.read_bytes()
+        if not data.startswith(INDEX_FILE_MAGIC):
+            raise ValueError(f"{path} is not a manifest index file")
+        *sections, child_map = marshal.loads(memoryview(data)[len(INDEX_FILE_MAGIC) :])
+        return cls(
+            *(
+                {sys.intern(node_id): ManifestNode.from_fields(fields) for node_id, fields in section}
+                for section in sections
+            ),
+            {sys.intern(node_id): tuple(map(sys.intern, child_ids)) for node_id, child_ids in child_map},
+        )
+
+    def write(self, path: Path) -> None:
+        """Atomically store nodes, sources, macros and child map in a compact index file."""
+        payload = (
+            *(
+                tuple((node_id, node.fields()) for node_id, node in section.items())
+                for section in (self.nodes, self.sources, self.macros)
+            ),
+            tuple(self.child_map.items()),
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode="wb", dir=path.parent, suffix=".tmp", delete=False) as f:
+            f.write(INDEX_FILE_MAGIC)
+            marshal.dump(payload, f)
+        os.replace(f.name, path)
+
+    def find_model(self, file: str) -> tuple[str | None, ManifestNode | None]:
+        """Return first model whose path, name or file stem matches file."""
+        matches = [
+            match
+            for match in (
+                self._models_by_path.get(_normalize_path(file)),
+                self._models_by_stem.get(Path(file).stem),
+            )
+            if match
+        ]
+        if not matches:
+            return None, None
+        _, node_id = min(matches)
+        return node_id, self.nodes[node_id]
+
+    def find_test(self, name: str) -> tuple[str | None, ManifestNode | None]:
+        """Return test node by name, alias or unique id segment."""
+        node_ids = self._tests_by_name.get(name)
+        return (node_ids[0], self.nodes[node_ids[0]]) if node_ids else (None, None)
+
+    def resource_path(self, name: str) -> str | None:
+        """Return file of model, snapshot, seed or macro by name, alias or file stem."""
+        return self._resource_paths.get(name)
+
+    def test_model_paths(self, name: str) -> Iterator[str]:
+        """Yield files of models tested by tests matching name."""
+        for node_id in self._tests_by_name.get(name, ()):
+            for dep_id in self.nodes[node_id].depends_on:
+                dep_node = self.nodes.get(dep_id)
+                if dep_node and dep_node.resource_type in MODEL_TYPES and dep_node.original_file_path:
+                    yield dep_node.original_file_path
+
+    def macro_ids(self, names: set[str]) -> list[str]:
+        """Return ids of macros with the given names in manifest order."""
+        return sorted(
+            (macro_id for name in names for macro_id in self._macros_by_name.get(name, ())),
+            key=self._macro_positions.__getitem__,
+        )
+
+    @cached_property
+    def _lineage(self) -> "ModelLineage":
+        return ModelLineage(self)
+
+    def parent_models(self, node_id: str) -> list[str]:
+        """Return models, snapshots and seeds the node depends on."""
+        return self._lineage.neighbours(node_id, upstream=True)
+
+    def child_models(self, node_id: str) -> list[str]:
+        """Return models, snapshots and seeds depending on the node."""
+        return self._lineage.neighbours(node_id, upstream=False)
+
+    def downstream_counts(self, node_id: str, max_depth: int) -> list[int]:
+        """Return number of downstream models first reached at each depth up to max_depth."""
+        return self._lineage.level_counts(node_id, max_depth, upstream=False)
+
+
+class ModelLineage:
+    def __init__(self, manifest: ManifestIndex):
+        """Build CSR parent and child adjacency arrays over models, snapshots and seeds."""
+        self.model_ids = [node_id for node_id, node in manifest.nodes.items() if node.resource_type in MODEL_TYPES]
+        self.positions = {node_id: position for position, node_id in enumerate(self.model_ids)}
+        self.parents = self._csr(manifest.nodes[node_id].depends_on for node_id in self.model_ids)
+        self.children = self._csr(manifest.child_map.get(node_id, ()) for node_id in self.model_ids)
+
+    def _csr(self, neighbour_lists: Iterable[Iterable[str]]) -> tuple[array, array]:
+        offsets = array("l", [0])
+        targets = array("l")
+        for neighbours in neighbour_lists:
+            targets.extend(self.positions[node_id] for node_id in neighbours if node_id in self.positions)
+            offsets.append(len(targets))
+        return offsets, targets
+
+    def neighbours(self, node_id: str, upstream: bool) -> list[str]:
+        """Return model neighbours of a node in manifest dependency order."""
+        position = self.positions.get(node_id)
+        if position is None:
+            return []
+        offsets, targets = self.parents if upstream else self.children
+        return [self.model_ids[target] for target in targets[offsets[position] : offsets[position + 1]]]
+
+    def level_counts(self, node_id: str, max_depth: int, upstream: bool) -> list[int]:
+        """Count models first reached at each depth of a breadth-first walk."""
+        position = self.positions.get(node_id)
+        counts = [0] * max(max_depth, 0)
+        if position is None:
+            return counts
+
+        offsets, targets = self.parents if upstream else self.children
+        seen = bytearray(len(self.model_ids))
+        seen[position] = 1
+        queue = deque([(position, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if depth >= max_depth:
+                continue
+            for target in targets[offsets[current] : offsets[current + 1]]:
+                if not seen[target]:
+                    seen[target] = 1
+                    counts[depth] += 1
+                    queue.append((target, depth + 1))
+        return counts
+
+
+EMPTY_MANIFEST = ManifestIndex.from_manifest({})
+
+
+def _parse_manifest_index(path: str) -> ManifestIndex:
+    with open(path, mode="rb") as f:
+        if not ijson:
+            return ManifestIndex.from_manifest(json.load(f))
+        try:
+            return ManifestIndex.stream(f)
+        except ijson.JSONError as exc:
+            # Callers handle malformed manifests the same way with either parser.
+            raise json.JSONDecodeError(str(exc), "", f.tell()) from exc
+
+
+def _evict_index_files(index_dir: Path, keep: Path) -> None:
+    files = sorted(index_dir.glob(f"*{INDEX_FILE_SUFFIX}"), key=lambda file: file.stat().st_mtime, reverse=True)
+    for file in files[MAX_INDEX_FILES:]:
+        if file != keep:
+            file.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=MANIFEST_CACHE_SIZE)
+def _load_manifest_index(path: str, mtime_ns: int, size: int, index_dir: Path | None) -> ManifestIndex:
+    if not index_dir:
+        return _parse_manifest_index(path)
+
+    index_file = index_dir / f"{_manifest_digest(path, mtime_ns, size)}{INDEX_FILE_SUFFIX}"
+    try:
+        index = ManifestIndex.read(index_file)
+        os.utime(index_file)
+        return index
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, EOFError, TypeError) as exc:
+        logging.warning("Unable to read manifest index %s; rebuilding it: %s", index_file, exc)
+
+    index = _parse_manifest_index(path)
+    try:
+        index.write(index_file)
+        _evict_index_files(index_dir, index_file)
+    except OSError as exc:
+        logging.warning("Unable to store manifest index %s: %s", index_file, exc)
+    return index
+
+
+@lru_cache(maxsize=MANIFEST_CACHE_SIZE)
+def _manifest_digest(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, mode="rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _load_lock(path: str) -> Lock:
+    """Return one of a fixed set of locks letting one caller per manifest path parse it while others wait."""
+    return _load_locks[hash(path) % MANIFEST_LOAD_LOCKS]
+
+
+def load_manifest_index(path: Path, index_dir: Path | None = None) -> ManifestIndex:
+    """Load manifest index, shared through index_dir files named by manifest content hash."""
+    stat = path.stat()
+    with _load_lock(str(path)):
+        return _load_manifest_index(str(path), stat.st_mtime_ns, stat.st_size, index_dir)
+
+
+def manifest_digest(path: Path) -> str:
+    """Return content hash of manifest, reusing it until the manifest file changes."""
+    stat = path.stat()
+    return _manifest_digest(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+class ReferenceMemo:
+    def __init__(self, path: Path, max_rows: int = MEMO_MAX_ROWS):
+        """Initialize SQLite memo of log references resolved per manifest content."""
+        self.path = path
+        self.max_rows = max_rows
+
+    @contextmanager
+    def _connect(self, write: bool = False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=MEMO_TIMEOUT, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(MEMO_SCHEMA)
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def get_many(self, manifest: str, references: Iterable[str]) -> dict[str, str | None]:
+        """Return memoized files of references; unresolvable references map to None."""
+        references = list(dict.fromkeys(references))
+        if not references:
+            return {}
+
+        with self._connect() as conn:
+            placeholders = ",".join("?" * len(references))
+            return {
+                reference: file
+                for reference, file in conn.execute(
+                    f"SELECT reference, file FROM manifest_references "
+                    f"WHERE manifest = ? AND reference IN ({placeholders})",
+                    (manifest, *references),
+                )
+            }
+
+    def put_many(self, manifest: str, files: dict[str, str | None]) -> None:
+        """Store resolved files of references for manifest content."""
+        if not files:
+            return
+
+        now = time.time()
+        with self._connect(write=True) as conn:
+            conn.executemany(
+                "INSERT INTO manifest_references (manifest, reference, file, used_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (manifest, reference) DO UPDATE SET file = excluded.file, used_at = excluded.used_at",
+                [(manifest, reference, file, now) for reference, file in files.items()],
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM manifest_references").fetchone()
+            if count > self.max_rows:
+                conn.execute(
+                    "DELETE FROM manifest_references WHERE rowid IN "
+                    "(SELECT rowid FROM manifest_references ORDER BY used_at LIMIT ?)",
+                    (count - self.max_rows,),
+                )
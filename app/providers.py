@@ -9,8 +9,9 @@ from google.genai import types
 from ollama import Client, RequestError as OllamaRequestError
 
 from common.config import Config, get_config
-from app.context import get_file_context
-from app.utils import get_error_files_from_dbt_log, get_instruction
+from app.context import get_file_contexts
+from app.jobs import job_stage
+from app.utils import get_error_files_from_dbt_artifacts, get_error_files_from_dbt_log, get_instruction
 
 TRANSIENT_PROVIDER_ERRORS = (
     requests.ConnectionError,
@@ -167,14 +168,14 @@ class AbstractProvider(ABC):
 
     def get_solution(self) -> str:
         """Gets the final response that contains presumably solution"""
-        files = get_error_files_from_dbt_log(self.context)
-        if not files and self.config.uploaded_dbt_log.exists():
-            try:
-                files = get_error_files_from_dbt_log(
-                    self.config.uploaded_dbt_log.read_text(encoding="utf-8", errors="replace")
-                )
-            except OSError as exc:
-                logging.warning("Unable to read uploaded dbt log for file detection: %s", exc)
+        with job_stage("log_scan"):
+            files = get_error_files_from_dbt_artifacts() or get_error_files_from_dbt_log(self.context)
+            if not files and self.config.uploaded_dbt_log.exists():
+                try:
+                    with self.config.uploaded_dbt_log.open("r", encoding="utf-8", errors="replace") as log:
+                        files = get_error_files_from_dbt_log(log)
+                except OSError as exc:
+                    logging.warning("Unable to read uploaded dbt log for file detection: %s", exc)
 
         if files:
             logging.info("Files selected from dbt log: %s", files)
@@ -185,13 +186,16 @@ class AbstractProvider(ABC):
         files = list(dict.fromkeys(files))
         results = []
 
-        for file in files:
-            file_ctx = get_file_context(file)
+        with job_stage("context"):
+            file_contexts = get_file_contexts(files)
+
+        for file, file_ctx in zip(files, file_contexts):
             if not file_ctx:
                 logging.warning("No file context found for: %s", file)
                 continue
             logging.info("File context for %s:\n%s", file, file_ctx)
-            results.append(self.send_for_llm(file_ctx))
+            with job_stage("llm"):
+                results.append(self.send_for_llm(file_ctx))
 
         return "\n----\n".join(results)
 
@@ -70,9 +70,30 @@ def node_symbols(name: str, path: str, source: str) -> set[str]:
     )
 
 
-def relevance_score(source: str, name: str, path: str, signals: set[str]) -> int:
+def indexed_symbols(source: str) -> dict[str, int]:
+    """Return relevance weights of symbols in a node source for the symbol index."""
+    source = source or ""
+    weights = dict.fromkeys(_symbols(SQL_IDENTIFIER_RE.findall(source.lower())), 1)
+    for symbol in (
+        extract_refs(source)
+        | extract_macro_calls(source)
+        | extract_aliases(source)
+        | _symbols(SQL_CTE_RE.findall(source))
+    ):
+        weights[symbol] = 3
+    return weights
+
+
+def indexed_relevance_score(name: str, path: str, weights: dict[str, int], signals: set[str]) -> int:
+    """Score a node by overlap with error symbols from its indexed symbol weights."""
+    own_symbols = {_clean_symbol(name), _clean_symbol(Path(path).stem)}
+    return sum(3 if signal in own_symbols else weights.get(signal, 0) for signal in signals)
+
+
+def relevance_score(source: str, name: str, path: str, signals: set[str], symbols: set[str] | None = None) -> int:
     """Score a node by overlap with error symbols."""
-    symbols = node_symbols(name, path, source)
+    if symbols is None:
+        symbols = node_symbols(name, path, source)
     source_lower = (source or "").lower()
     return sum(3 if signal in symbols else int(bool(signal and signal in source_lower)) for signal in signals)
 
@@ -0,0 +1,118 @@
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Iterable
+import sqlite3
+import time
+
+from app.rag import indexed_symbols
+
+SYMBOL_INDEX_TIMEOUT = 30
+SYMBOL_INDEX_MAX_FILES = 200_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_files (
+    checksum TEXT PRIMARY KEY,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    symbol TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (symbol, checksum)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_checksum ON postings (checksum);
+CREATE INDEX IF NOT EXISTS indexed_files_indexed_at ON indexed_files (indexed_at);
+"""
+
+
+class SymbolIndex:
+    def __init__(self, path: Path, max_files: int = SYMBOL_INDEX_MAX_FILES):
+        """Initialize SQLite inverted index from source symbols to node file checksums."""
+        self.path = path
+        self.max_files = max_files
+
+    @contextmanager
+    def _connect(self, write: bool = False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=SYMBOL_INDEX_TIMEOUT, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def weights(self, sources: dict[str, Callable[[], str]], symbols: Iterable[str]) -> dict[str, dict[str, int]]:
+        """Return weights of symbols per indexed checksum in one query, indexing unseen readable sources first."""
+        checksums = list(sources)
+        symbols = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+        if not checksums:
+            return {}
+
+        checksum_placeholders = ",".join("?" * len(checksums))
+        with self._connect() as conn:
+            indexed = {
+                checksum
+                for (checksum,) in conn.execute(
+                    f"SELECT checksum FROM indexed_files WHERE checksum IN ({checksum_placeholders})",
+                    checksums,
+                )
+            }
+        missing = [checksum for checksum in checksums if checksum not in indexed]
+        if missing:
+            indexed.update(self._index(missing, sources))
+        checksums = [checksum for checksum in checksums if checksum in indexed]
+        weights = {checksum: {} for checksum in checksums}
+        if not symbols or not checksums:
+            return weights
+
+        checksum_placeholders = ",".join("?" * len(checksums))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT checksum, symbol, weight FROM postings "
+                f"WHERE symbol IN ({','.join('?' * len(symbols))}) AND checksum IN ({checksum_placeholders})",
+                (*symbols, *checksums),
+            )
+            for checksum, symbol, weight in rows:
+                weights[checksum][symbol] = weight
+        return weights
+
+    def _index(self, checksums: list[str], sources: dict[str, Callable[[], str]]) -> list[str]:
+        # Unreadable sources come back empty; recording them would pin a score of zero to their content hash.
+        texts = {checksum: text for checksum in checksums if (text := sources[checksum]())}
+        checksums = list(texts)
+        if not checksums:
+            return []
+
+        postings = [
+            (symbol, checksum, weight)
+            for checksum, text in texts.items()
+            for symbol, weight in indexed_symbols(text).items()
+        ]
+        now = time.time()
+        with self._connect(write=True) as conn:
+            conn.executemany("INSERT OR IGNORE INTO postings (symbol, checksum, weight) VALUES (?, ?, ?)", postings)
+            conn.executemany(
+                "INSERT OR IGNORE INTO indexed_files (checksum, indexed_at) VALUES (?, ?)",
+                [(checksum, now) for checksum in checksums],
+            )
+            self._compact(conn)
+        return checksums
+
+    def _compact(self, conn: sqlite3.Connection) -> None:
+        (count,) = conn.execute("SELECT COUNT(*) FROM indexed_files").fetchone()
+        if count <= self.max_files:
+            return
+
+        stale = [
+            (checksum,)
+            for (checksum,) in conn.execute(
+                "SELECT checksum FROM indexed_files ORDER BY indexed_at LIMIT ?",
+                (count - self.max_files,),
+            )
+        ]
+        conn.executemany("DELETE FROM postings WHERE checksum = ?", stale)
+        conn.executemany("DELETE FROM indexed_files WHERE checksum = ?", stale)
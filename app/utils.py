@@ -1,24 +1,78 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from pathlib import Path
-from typing import BinaryIO
+from threading import Lock
+from typing import Callable, Iterable, Iterator, TypeVar
 from urllib.parse import quote
 import subprocess
+import asyncio
+import os
+import shutil
 import logging
 import json
 import re
+import sqlite3
 from common.config import get_config
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from app.jobs import current_job, job_stage, normalize_repo
+from app.ledger import ErrorLedger
+from app.manifest import EMPTY_MANIFEST, ManifestIndex, ReferenceMemo, load_manifest_index, manifest_digest
+from app.dbt_cache import PartialParseStore, get_directory_cache, install_dbt_packages, target_path
+from app.log_scanner import (
+    EXPLICIT_FAILURE_KINDS,
+    FALLBACK_FAILURE_KINDS,
+    FailureKind,
+    LogSource,
+    collect_failure_events,
+    iter_failure_events,
+)
 from app.dbt_exps import (
     DBT_SOURCE_DIRS,
     DBT_SOURCE_EXTENSIONS,
-    DBT_NODE_RESOURCE_TYPES,
     DbtRegularExpressions
 )
 
 config = get_config()
 exp = DbtRegularExpressions()
 
+GIT_FETCH_DEPTH = 2
+DBT_ARTIFACTS = ("manifest.json", "run_results.json")
+ARTIFACT_METADATA_HEAD_BYTES = 64 * 1024
+MAX_PREFETCH_PATHS = 20
+TAIL_CHUNK_SIZE = 64 * 1024
+MAX_CONCURRENT_READS = 8
+FAILED_NODE_STATUSES = {"error", "fail", "runtime error"}
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+checkout_ready: ContextVar[Future | None] = ContextVar("checkout_ready", default=None)
+dbt_metadata_ready: ContextVar[Future | None] = ContextVar("dbt_metadata_ready", default=None)
+
+_store_locks: dict[str, Lock] = {}
+_store_locks_guard = Lock()
+
+
+def map_concurrently(function: Callable[[T], R], items: Iterable[T], max_workers: int = MAX_CONCURRENT_READS) -> list[R]:
+    """Apply function to items on a bounded thread pool, keeping order and the caller's context variables."""
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [pool.submit(copy_context().run, function, item) for item in items]
+        return [future.result() for future in futures]
+
+
 def get_failed_repo_path() -> Path:
     """Return checked-out dbt project path."""
+    _wait_for(checkout_ready)
     if not config.dbt_project_name:
         raise RuntimeError("DBT_PROJECT_NAME is not configured")
 
@@ -34,13 +88,6 @@ def _dedupe(items: list[str]) -> list[str]:
     return list(dict.fromkeys(item for item in items if item))
 
 
-def _clean_log_text(log_text: str | list[str] | None) -> str:
-    """Normalize log text and remove ANSI escapes."""
-    if isinstance(log_text, list):
-        log_text = "\n".join(log_text)
-    return exp.ANSI_ESCAPE_RE.sub("", str(log_text or ""))
-
-
 def _normalize_dbt_source_path(raw_path: str | None) -> str | None:
     """Normalize raw path to a dbt source path."""
     if not raw_path:
@@ -62,85 +109,119 @@ def _normalize_dbt_source_path(raw_path: str | None) -> str | None:
     return path
 
 
-def _read_dbt_manifest() -> dict:
-    """Read dbt manifest from failed repository."""
+def wait_for_dbt_metadata() -> list[str]:
+    """Block until dbt metadata of the current job is ready and return names of installed CI artifacts."""
+    return _wait_for(dbt_metadata_ready) or []
+
+
+def _dbt_manifest_path() -> Path | None:
+    """Return dbt manifest path of failed repository once metadata is ready."""
+    wait_for_dbt_metadata()
     try:
         manifest_path = get_failed_repo_path() / "target" / "manifest.json"
     except RuntimeError:
-        return {}
+        return None
 
-    if not manifest_path.exists():
-        return {}
+    return manifest_path if manifest_path.exists() else None
+
+
+def _read_dbt_manifest() -> ManifestIndex:
+    """Read dbt manifest index from failed repository."""
+    manifest_path = _dbt_manifest_path()
+    if not manifest_path:
+        return EMPTY_MANIFEST
 
     try:
-        with open(manifest_path, mode="r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_manifest_index(manifest_path, config.manifest_index_dir)
     except (OSError, json.JSONDecodeError) as exc:
         logging.warning("Unable to read dbt manifest at %s: %s", manifest_path, exc)
-        return {}
+        return EMPTY_MANIFEST
 
 
-def _resolve_manifest_source(resource_name: str | None) -> str | None:
-    """Resolve dbt resource name through manifest metadata."""
-    if not resource_name:
-        return None
+def reference_memo() -> ReferenceMemo:
+    """Return memo of log references resolved through dbt manifests."""
+    return ReferenceMemo(config.manifest_memo)
 
-    name = resource_name.strip().strip("`'\".,;:()[]{}").split(".")[-1]
-    if not name:
+
+def _reference_name(raw_name: str | None) -> str | None:
+    """Return bare dbt resource name of a log reference."""
+    if not raw_name:
         return None
+    return raw_name.strip().strip("`'\".,;:()[]{}").split(".")[-1] or None
 
-    manifest = _read_dbt_manifest()
-    for node in manifest.get("nodes", {}).values():
-        original_file_path = node.get("original_file_path")
-        if node.get("resource_type") not in DBT_NODE_RESOURCE_TYPES or not original_file_path:
-            continue
 
-        identifiers = {
-            str(node.get("name") or ""),
-            str(node.get("alias") or ""),
-            Path(original_file_path).stem,
-        }
-        if name in identifiers:
-            return _normalize_dbt_source_path(original_file_path)
-
-    for macro in manifest.get("macros", {}).values():
-        original_file_path = macro.get("original_file_path")
-        if not original_file_path:
-            continue
+def _manifest_reference_file(manifest: ManifestIndex, reference: str) -> str | None:
+    """Resolve one memo reference against manifest index."""
+    kind, _, name = reference.partition(":")
+    if kind == "test":
+        return next(
+            (path for path in map(_normalize_dbt_source_path, manifest.test_model_paths(name)) if path),
+            None,
+        )
+    return _normalize_dbt_source_path(manifest.resource_path(name))
 
-        identifiers = {
-            str(macro.get("name") or ""),
-            Path(original_file_path).stem,
-        }
-        if name in identifiers:
-            return _normalize_dbt_source_path(original_file_path)
 
-    return None
+def _resolve_manifest_references(references: Iterable[str]) -> dict[str, str | None]:
+    """Resolve log references together against one manifest load and the persistent memo."""
+    references = list(dict.fromkeys(reference for reference in references if reference))
+    if not references:
+        return {}
+
+    manifest_path = _dbt_manifest_path()
+    if not manifest_path:
+        return {}
+
+    try:
+        digest = manifest_digest(manifest_path)
+    except OSError as exc:
+        logging.warning("Unable to read dbt manifest at %s: %s", manifest_path, exc)
+        return {}
+
+    memo = reference_memo()
+    try:
+        files = memo.get_many(digest, references)
+    except sqlite3.Error as exc:
+        logging.warning("Unable to read manifest reference memo: %s", exc)
+        files = {}
+
+    missing = [reference for reference in references if reference not in files]
+    if missing:
+        manifest = _read_dbt_manifest()
+        resolved = {reference: _manifest_reference_file(manifest, reference) for reference in missing}
+        if manifest is not EMPTY_MANIFEST:
+            try:
+                memo.put_many(digest, resolved)
+            except sqlite3.Error as exc:
+                logging.warning("Unable to update manifest reference memo: %s", exc)
+        files.update(resolved)
+    return files
+
+
+def _event_reference(resource_type: str | None, resource_name: str | None, raw_path: str | None) -> str | None:
+    """Return manifest reference needed to resolve a dbt error reference."""
+    name = _reference_name(resource_name)
+    if not name:
+        return None
+    if resource_type and resource_type.lower() == "test":
+        return f"test:{name}"
+    if _normalize_dbt_source_path(raw_path):
+        return None
+    return f"resource:{name}"
 
 
-def _resolve_test_failure_source(test_name: str | None, raw_path: str | None) -> str | None:
+def _resolve_test_failure_source(
+    test_name: str | None,
+    raw_path: str | None,
+    manifest_files: dict[str, str | None],
+) -> str | None:
     """Resolve tested source file for dbt test failure."""
-    if not test_name:
+    name = _reference_name(test_name)
+    if not name:
         return None
 
-    name = test_name.strip().strip("`'\".,;:()[]{}").split(".")[-1]
-    manifest = _read_dbt_manifest()
-    for node_id, node in manifest.get("nodes", {}).items():
-        identifiers = {str(node.get("name") or ""), str(node.get("alias") or "")}
-        if node.get("resource_type") != "test":
-            continue
-        if (
-            name not in identifiers
-            and f".{name}." not in node_id
-            and not node_id.endswith(f".{name}")
-        ):
-            continue
-        for dep_id in node.get("depends_on", {}).get("nodes", []):
-            dep_node = manifest.get("nodes", {}).get(dep_id)
-            if dep_node and dep_node.get("resource_type") in ("model", "snapshot", "seed"):
-                resolved = _normalize_dbt_source_path(dep_node.get("original_file_path"))
-                if resolved:
-                    return resolved
+    resolved = manifest_files.get(f"test:{name}")
+    if resolved:
+        return resolved
 
     try:
         failed_repo_path = get_failed_repo_path()
@@ -163,19 +244,16 @@ def _resolve_test_failure_source(test_name: str | None, raw_path: str | None) ->
     return None
 
 
-def _resolve_source_file(resource_name: str | None) -> str | None:
+def _resolve_source_file(resource_name: str | None, manifest_files: dict[str, str | None]) -> str | None:
     """Resolve dbt source file by resource name."""
-    resolved = _resolve_manifest_source(resource_name)
-    if resolved:
-        return resolved
-
-    if not resource_name:
-        return None
-
-    name = resource_name.strip().strip("`'\".,;:()[]{}").split(".")[-1]
+    name = _reference_name(resource_name)
     if not name:
         return None
 
+    resolved = manifest_files.get(f"resource:{name}")
+    if resolved:
+        return resolved
+
     try:
         failed_repo_path = get_failed_repo_path()
     except RuntimeError:
@@ -195,99 +273,202 @@ def _resolve_dbt_error_reference(
     resource_type: str | None,
     resource_name: str | None,
     raw_path: str | None,
+    manifest_files: dict[str, str | None],
 ) -> str | None:
     """Resolve dbt error reference to source file path."""
     if resource_type and resource_type.lower() == "test":
-        return _resolve_test_failure_source(resource_name, raw_path)
+        return _resolve_test_failure_source(resource_name, raw_path, manifest_files)
 
-    return _normalize_dbt_source_path(raw_path) or _resolve_source_file(resource_name)
+    return _normalize_dbt_source_path(raw_path) or _resolve_source_file(resource_name, manifest_files)
 
 
-def get_error_files_from_dbt_log(log_text: str | list[str] | None) -> list[str]:
+def get_error_files_from_dbt_log(log_text: LogSource) -> list[str]:
     """Extract failing dbt source files from dbt's own error lines."""
-    text = _clean_log_text(log_text)
-    if not text:
-        return []
+    events = collect_failure_events(log_text)
+
+    explicit_events = [event for kind in EXPLICIT_FAILURE_KINDS for event in events[kind]]
+    manifest_files = _resolve_manifest_references(
+        _event_reference(event.resource, event.name, event.path) for event in explicit_events
+    )
 
     files = []
     unresolved_test_failure = False
-    for pattern in exp.DBT_EXPLICIT_ERROR_PATTERNS:
-        for match in pattern.finditer(text):
-            resource = match.groupdict().get("resource")
-            resolved = _resolve_dbt_error_reference(
-                resource,
-                match.groupdict().get("name"),
-                match.groupdict().get("path"),
-            )
-            if resolved:
-                files.append(resolved)
-            elif resource and resource.lower() == "test":
-                unresolved_test_failure = True
+    for event in explicit_events:
+        resolved = _resolve_dbt_error_reference(event.resource, event.name, event.path, manifest_files)
+        if resolved:
+            files.append(resolved)
+        elif event.resource and event.resource.lower() == "test":
+            unresolved_test_failure = True
 
     if files or unresolved_test_failure:
         return _dedupe(files)
 
-    for match in exp.DBT_SOURCE_PATH_RE.finditer(text):
-        resolved = _normalize_dbt_source_path(match.group("path"))
+    for event in events[FailureKind.SOURCE_PATH]:
+        resolved = _normalize_dbt_source_path(event.path)
         if resolved:
             files.append(resolved)
 
     if files:
         return _dedupe(files)
 
-    for match in exp.DBT_STATUS_MODEL_RE.finditer(text):
-        relation = match.group("relation")
-        resolved = _resolve_source_file(relation.split(".")[-1])
-        if resolved:
-            files.append(resolved)
-
-    for match in exp.DBT_NATURAL_MODEL_RE.finditer(text):
-        resolved = _resolve_source_file(match.group("name"))
+    fallback_events = [event for kind in FALLBACK_FAILURE_KINDS for event in events[kind]]
+    manifest_files = _resolve_manifest_references(
+        _event_reference(None, event.name, None) for event in fallback_events
+    )
+    for event in fallback_events:
+        resolved = _resolve_source_file(event.name, manifest_files)
         if resolved:
             files.append(resolved)
 
     return _dedupe(files)
 
-def scan_hashes() -> None:
-    """Scan dbt log for error hashes and store them in a separate file."""
-    with config.logs_file.open('r', encoding='utf-8') as err_:
-        err_lines = err_.read().splitlines(True)
 
-    if not config.uploaded_dbt_log.exists():
-        return
+def iter_failed_run_results(path: Path) -> Iterator[str]:
+    """Yield unique ids of failed nodes from dbt run_results.json."""
+    with open(path, mode="rb") as f:
+        if ijson:
+            results = ijson.items(f, "results.item")
+        else:
+            results = json.load(f).get("results", [])
+        for result in results:
+            if str(result.get("status") or "").lower() in FAILED_NODE_STATUSES and result.get("unique_id"):
+                yield result["unique_id"]
 
-    with config.logs_file.open('a', encoding='utf-8') as err:
-        with config.uploaded_dbt_log.open('r', encoding='utf-8') as f:
-            for line in f:
-                if '=' * 30 in line and '|' in line:
-                    h = line.split('|')[1].replace('=', '').strip() + '\n'
-                    if h not in err_lines:
-                        err.write(h)
 
-def get_context_log() -> str:
-    """Retrieve the context log based on the last stored error hash."""
-    with config.logs_file.open('r', encoding='utf-8') as err:
-        lines = err.read().splitlines(True)
+def iter_failed_json_log_nodes(lines: Iterable[str]) -> Iterator[str]:
+    """Yield unique ids of failed nodes from a dbt log written with --log-format json."""
+    for line in lines:
+        if not line.lstrip().startswith("{") or '"node_status"' not in line:
+            continue
+        try:
+            node_info = json.loads(line).get("data", {}).get("node_info") or {}
+        except (ValueError, AttributeError):
+            continue
+        if str(node_info.get("node_status") or "").lower() in FAILED_NODE_STATUSES and node_info.get("unique_id"):
+            yield node_info["unique_id"]
 
-    if not lines:
+
+def _is_json_log(path: Path) -> bool:
+    with open(path, mode="r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.strip():
+                return line.lstrip().startswith("{")
+    return False
+
+
+def _failed_unique_ids() -> list[str]:
+    if config.uploaded_dbt_log.exists() and _is_json_log(config.uploaded_dbt_log):
+        with open(config.uploaded_dbt_log, mode="r", encoding="utf-8", errors="replace") as f:
+            unique_ids = _dedupe(list(iter_failed_json_log_nodes(f)))
+        if unique_ids:
+            return unique_ids
+
+    # Only run results uploaded from the failed CI invocation describe this failure.
+    if "run_results.json" not in wait_for_dbt_metadata():
+        return []
+    try:
+        run_results = target_path(get_failed_repo_path()) / "run_results.json"
+    except RuntimeError:
+        return []
+    try:
+        return _dedupe(list(iter_failed_run_results(run_results)))
+    except (OSError, ValueError) as exc:
+        logging.warning("Unable to read dbt run results at %s: %s", run_results, exc)
         return []
 
-    last_hash = lines[-1].strip()
 
+def _unique_id_source(manifest: ManifestIndex, unique_id: str) -> str | None:
+    """Resolve manifest unique_id to the source file to fix."""
+    nodes = manifest.nodes
+    node = nodes.get(unique_id) or manifest.sources.get(unique_id)
+    if not node:
+        return None
+
+    if node.resource_type == "test":
+        for dep_id in node.depends_on:
+            dep_node = nodes.get(dep_id)
+            if dep_node and dep_node.resource_type in ("model", "snapshot", "seed"):
+                return _normalize_dbt_source_path(dep_node.original_file_path)
+        path = _normalize_dbt_source_path(node.original_file_path)
+        return path if path and path.startswith("tests/") else None
+
+    return _normalize_dbt_source_path(node.original_file_path)
+
+
+def get_error_files_from_dbt_artifacts() -> list[str]:
+    """Resolve failing files from run_results.json or a JSON dbt log through the manifest."""
+    unique_ids = _failed_unique_ids()
+    if not unique_ids:
+        return []
+
+    manifest = _read_dbt_manifest()
+    return _dedupe([_unique_id_source(manifest, unique_id) for unique_id in unique_ids])
+
+
+def iter_log_hashes(lines: Iterable[str]) -> Iterator[str]:
+    """Yield dbt invocation hashes from log separator lines."""
+    for line in lines:
+        if '=' * 30 in line and '|' in line:
+            yield line.split('|')[1].replace('=', '').strip()
+
+
+def error_ledger() -> ErrorLedger:
+    """Return ledger of dbt invocations seen per repository."""
+    return ErrorLedger(config.error_ledger, config.error_ledger_ttl_days * 86400, config.error_ledger_max_rows)
+
+
+def _ledger_scope() -> tuple[str, str | None]:
+    job = current_job.get()
+    if job:
+        return normalize_repo(job.repo), job.id
+    return normalize_repo(config.github_repo_link), None
+
+
+def scan_hashes() -> list[str]:
+    """Record dbt invocation hashes of the uploaded log and return the new ones."""
     if not config.uploaded_dbt_log.exists():
         return []
 
-    is_found = False
-    context_log = []
-    
-    with config.uploaded_dbt_log.open('r', encoding='utf-8') as f:
-        for line in f:
-            if last_hash in line:
-                is_found = True
-            if is_found and line.strip():
-                context_log.append(line.strip())
-    
-    return '\n'.join(context_log)
+    repo, job_id = _ledger_scope()
+    with config.uploaded_dbt_log.open('r', encoding='utf-8', errors='replace') as f:
+        return error_ledger().record(repo, job_id, iter_log_hashes(f))
+
+def read_tail(path: Path, max_bytes: int, marker: bytes | None = None) -> bytes:
+    """Read file backwards in chunks up to the line holding the last marker or max_bytes."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        found = -1
+        while position > 0 and len(data) < max_bytes:
+            size = min(TAIL_CHUNK_SIZE, position, max_bytes - len(data))
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+
+            if marker and found < 0:
+                found = data.rfind(marker, 0, size + len(marker) - 1)
+            elif found >= 0:
+                found += size
+            if found >= 0 and (b"\n" in data[:found] or position == 0):
+                return data[data.rfind(b"\n", 0, found) + 1:]
+
+    if position > 0:
+        return data[data.find(b"\n") + 1:]
+    return data
+
+
+def get_context_log() -> str:
+    """Retrieve the latest dbt invocation block, reading the log from its end."""
+    if not config.uploaded_dbt_log.exists():
+        return []
+
+    last_hash = error_ledger().latest(*_ledger_scope())
+    if not last_hash:
+        return []
+
+    block = read_tail(config.uploaded_dbt_log, config.context_log_max_kb * 1024, last_hash.encode("utf-8"))
+    lines = block.decode("utf-8", errors="replace").splitlines()
+    return "\n".join(line.strip() for line in lines if line.strip())
 
 
 def get_instruction(name: str) -> str:
@@ -306,11 +487,17 @@ def has_dbt_dependencies(dbt_project_path: Path) -> bool:
     return any((dbt_project_path / name).exists() for name in ("packages.yml", "dependencies.yml"))
 
 
-def prepare_dbt_metadata(dbt_project_path: Path) -> None:
+def dbt_packages_cache():
+    """Return cache of installed dbt packages shared between jobs."""
+    return get_directory_cache(config.cache_root / "dbt_packages", config.dbt_deps_cache_mb * 1024 * 1024)
+
+
+def prepare_dbt_metadata(dbt_project_path: Path, project: str | None = None) -> None:
     """Refresh dbt dependencies and manifest metadata."""
     if has_dbt_dependencies(dbt_project_path):
         try:
-            subprocess.run(["dbt", "deps"], cwd=dbt_project_path, check=True)
+            with job_stage("deps"):
+                install_dbt_packages(dbt_project_path, dbt_packages_cache())
         except subprocess.CalledProcessError as e:
             logging.warning(
                 f"dbt deps failed; continuing without refreshed packages. "
@@ -319,14 +506,95 @@ def prepare_dbt_metadata(dbt_project_path: Path) -> None:
     else:
         logging.info("No dbt package config found; skipping dbt deps.")
 
+    parse_state = PartialParseStore(config.cache_root / "partial_parse") if project else None
     try:
-        subprocess.run(["dbt", "--show-all-deprecations", "parse"], cwd=dbt_project_path, check=True)
+        with job_stage("parse"):
+            if parse_state and parse_state.restore(project, dbt_project_path):
+                logging.info("Restored dbt partial parse state for %s", project)
+            subprocess.run(["dbt", "--show-all-deprecations", "parse"], cwd=dbt_project_path, check=True)
+            if parse_state:
+                parse_state.save(project, dbt_project_path)
     except subprocess.CalledProcessError as e:
         logging.warning(
             f"dbt parse failed; continuing without manifest lineage context. Error: {e}"
         )
 
 
+def read_artifact_metadata(path: Path) -> dict:
+    """Return metadata block of a dbt artifact without loading the whole file."""
+    with open(path, mode="r", encoding="utf-8", errors="replace") as f:
+        head = f.read(ARTIFACT_METADATA_HEAD_BYTES)
+        start = head.find('"metadata"')
+        if start >= 0:
+            try:
+                value_start = head.index(":", start) + 1
+                metadata, _ = json.JSONDecoder().raw_decode(head[value_start:].lstrip())
+                return metadata if isinstance(metadata, dict) else {}
+            except ValueError:
+                pass
+
+        f.seek(0)
+        try:
+            metadata = json.load(f).get("metadata")
+        except (ValueError, AttributeError):
+            return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def _same_commit(left: str, right: str) -> bool:
+    left, right = left.strip().lower(), right.strip().lower()
+    return bool(left and right) and (left.startswith(right) or right.startswith(left))
+
+
+def valid_ci_artifacts(artifacts: dict[str, Path], commit_hash: str, invocation_ids: set[str]) -> dict[str, Path]:
+    """Return uploaded dbt artifacts produced by the failed commit and logged invocation."""
+    manifest_path = artifacts.get("manifest.json")
+    if not manifest_path or not manifest_path.exists():
+        return {}
+
+    metadata = read_artifact_metadata(manifest_path)
+    git_sha = str(metadata.get("env", {}).get("GIT_SHA") or "")
+    if not _same_commit(git_sha, commit_hash):
+        logging.warning("Uploaded manifest was built for commit %r, not %s; ignoring it.", git_sha or None, commit_hash)
+        return {}
+
+    invocation_id = metadata.get("invocation_id")
+    if invocation_ids and invocation_id not in invocation_ids:
+        logging.warning("Uploaded manifest invocation %s is not in the dbt log; ignoring it.", invocation_id)
+        return {}
+
+    valid = {"manifest.json": manifest_path}
+    run_results_path = artifacts.get("run_results.json")
+    if run_results_path and run_results_path.exists():
+        if read_artifact_metadata(run_results_path).get("invocation_id") == invocation_id:
+            valid["run_results.json"] = run_results_path
+        else:
+            logging.warning("Uploaded run_results.json is from another dbt invocation; ignoring it.")
+    return valid
+
+
+def install_ci_artifacts(dbt_project_path: Path, artifacts: dict[str, Path], commit_hash: str) -> list[str]:
+    """Move valid CI artifacts into the dbt target directory and return their names."""
+    if not artifacts:
+        return []
+
+    invocation_ids = set()
+    if config.uploaded_dbt_log.exists():
+        with config.uploaded_dbt_log.open("r", encoding="utf-8", errors="replace") as f:
+            invocation_ids = set(iter_log_hashes(f))
+
+    valid = valid_ci_artifacts(artifacts, commit_hash, invocation_ids)
+    if not valid:
+        return []
+
+    target = target_path(dbt_project_path)
+    target.mkdir(parents=True, exist_ok=True)
+    for name, path in valid.items():
+        shutil.move(path, target / name)
+    logging.info("Using dbt artifacts from CI (%s); skipping dbt deps and parse.", ", ".join(valid))
+    return list(valid)
+
+
 def _authenticated_repo_url(repo: str) -> str:
     """Return clone URL with configured token when available."""
     if not config.github_token or not repo.startswith("https://"):
@@ -338,31 +606,192 @@ def _authenticated_repo_url(repo: str) -> str:
     return repo.replace("https://", f"https://{config.github_name}:{token}@")
 
 
-def clone_repo_from_ci(repo: str, commit_hash: str, dbt_path: str, log_file: BinaryIO) -> None:
-    """Clone failed repository and store uploaded dbt log."""
-    workdir = Path(Path.home() / ".failedrepo")
-    workdir.mkdir(parents=True, exist_ok=True)
+def _store_lock(store: Path) -> Lock:
+    """Return lock serializing git operations on a shared repository store."""
+    with _store_locks_guard:
+        return _store_locks.setdefault(str(store), Lock())
+
+
+def _git(*args: str, cwd: Path, check: bool = True) -> subprocess.CompletedProcess:
+    """Run git command in repository."""
+    return subprocess.run(["git", *args], cwd=cwd, check=check)
 
-    repo_name = repo.split("/")[-1].replace(".git", "")
-    repo_dir = workdir / repo_name
 
-    auth_repo = _authenticated_repo_url(repo)
+def _is_partial_store(store: Path) -> bool:
+    """Check whether repository store is a blobless partial clone."""
+    result = subprocess.run(
+        ["git", "config", "--get", "remote.origin.promisor"],
+        cwd=store,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() == "true"
+
+
+def sync_repo_store(repo: str, commit_hash: str) -> Path:
+    """Fetch failed commit and its parent into the shared partial mirror."""
+    store = config.repo_store(repo)
+    store.parent.mkdir(parents=True, exist_ok=True)
+    fetch = ["fetch", "--filter=blob:none", f"--depth={GIT_FETCH_DEPTH}", "--no-tags", "origin"]
+
+    with _store_lock(store):
+        if (store / "HEAD").exists() and not _is_partial_store(store):
+            logging.info("Replacing full repository store %s with a partial mirror", store)
+            shutil.rmtree(store)
+
+        if not (store / "HEAD").exists():
+            auth_repo = _authenticated_repo_url(repo)
+            _git(
+                "clone", "--bare", "--filter=blob:none", "--depth", "1", "--no-tags",
+                auth_repo, str(store),
+                cwd=store.parent,
+            )
+            _git("config", "remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*", cwd=store)
+
+        base_ref = f"+refs/heads/{config.base_branch}:refs/remotes/origin/{config.base_branch}"
+        if _git(*fetch, commit_hash, base_ref, cwd=store, check=False).returncode != 0:
+            logging.info("Unable to fetch %s directly; fetching branch heads instead.", commit_hash)
+            _git(*fetch, cwd=store)
+
+    return store
+
+
+def add_repo_worktree(store: Path, commit_hash: str, dbt_path: str = "") -> Path:
+    """Check out failed commit into the active job's sparse worktree."""
+    repo_dir = config.repo_root
+    with _store_lock(store):
+        if repo_dir.exists():
+            _git("worktree", "remove", "--force", str(repo_dir), cwd=store, check=False)
+            shutil.rmtree(repo_dir, ignore_errors=True)
+        _git("worktree", "prune", cwd=store)
+        _git("worktree", "add", "--no-checkout", "--detach", str(repo_dir), commit_hash, cwd=store)
+
+    sparse_path = dbt_path.strip().strip("/")
+    if sparse_path and sparse_path != ".":
+        _git("sparse-checkout", "set", "--cone", sparse_path, cwd=repo_dir)
+    _git("checkout", "--detach", commit_hash, cwd=repo_dir)
+    return repo_dir
+
+
+def remove_repo_worktree(repo: str) -> None:
+    """Remove the active job's worktree from the shared repository store."""
+    store = config.repo_store(repo)
+    repo_dir = config.repo_root
+    if not (store / "HEAD").exists():
+        return
+
+    with _store_lock(store):
+        _git("worktree", "remove", "--force", str(repo_dir), cwd=store, check=False)
+        _git("worktree", "prune", cwd=store, check=False)
 
-    if not (repo_dir / ".git").exists():
-        subprocess.run(["git", "clone", "--depth", "1", auth_repo], cwd=workdir, check=True)
-    
-    subprocess.run(["git", "fetch", "origin"], cwd=repo_dir, check=True)
-    subprocess.run(["git", "checkout", commit_hash], cwd=repo_dir, check=True)
 
-    config.logs_file.parent.mkdir(parents=True, exist_ok=True)
-    config.logs_file.touch(exist_ok=True)
+def store_uploaded_log(log_path: Path) -> None:
+    """Move uploaded dbt log into the job logs directory."""
     config.uploaded_dbt_log.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(config.uploaded_dbt_log, "wb") as f:
-        f.write(log_file.file.read())
+    shutil.move(log_path, config.uploaded_dbt_log)
+
+
+def checkout_failed_commit(repo: str, commit_hash: str, dbt_path: str) -> Path:
+    """Check out failed commit into a job worktree and return the dbt project path."""
+    with job_stage("clone"):
+        store = sync_repo_store(repo, commit_hash)
+        repo_dir = add_repo_worktree(store, commit_hash, dbt_path)
 
     failed_repo_path = repo_dir / dbt_path
     if not failed_repo_path.exists():
         raise RuntimeError(f"DBT project not found at {failed_repo_path}")
+    return failed_repo_path
+
+
+def build_dbt_metadata(
+    failed_repo_path: Path,
+    repo: str,
+    commit_hash: str,
+    dbt_path: str,
+    artifacts: dict[str, Path] | None = None,
+) -> list[str]:
+    """Use valid CI artifacts or run dbt deps and parse in the job worktree, returning installed artifact names."""
+    installed = install_ci_artifacts(failed_repo_path, artifacts or {}, commit_hash)
+    if not installed:
+        prepare_dbt_metadata(failed_repo_path, project=f"{config.repo_store(repo).name}/{dbt_path}")
+    return installed
+
+
+def logged_source_paths(limit: int = MAX_PREFETCH_PATHS) -> list[str]:
+    """Return source paths named in the uploaded dbt log without touching the checkout."""
+    if not config.uploaded_dbt_log.exists():
+        return []
+
+    with config.uploaded_dbt_log.open("r", encoding="utf-8", errors="replace") as f:
+        paths = [
+            _normalize_dbt_source_path(event.path)
+            for event in iter_failure_events(f)
+            if event.path and event.kind in (*EXPLICIT_FAILURE_KINDS, FailureKind.SOURCE_PATH)
+        ]
+    return _dedupe(paths)[:limit]
+
+
+def prefetch_blobs(failed_repo_path: Path, paths: list[str]) -> None:
+    """Download base revision blobs of logged files so later diffs stay local."""
+    if not paths:
+        return
+
+    for revision in ("HEAD^", f"origin/{config.base_branch}"):
+        exists = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{revision}^{{commit}}"],
+            cwd=failed_repo_path,
+            capture_output=True,
+        )
+        if exists.returncode != 0:
+            continue
+        # Content diff makes git fetch all missing blobs of these paths in one batch.
+        subprocess.run(
+            ["git", "diff", "--numstat", "--no-ext-diff", revision, "--", *paths],
+            cwd=failed_repo_path,
+            capture_output=True,
+        )
+        return
 
-    prepare_dbt_metadata(failed_repo_path)
+
+@contextmanager
+def track_repo_preparation():
+    """Let checkout and manifest readers wait for background repository preparation."""
+    checkout_token = checkout_ready.set(Future())
+    metadata_token = dbt_metadata_ready.set(Future())
+    try:
+        yield
+    finally:
+        dbt_metadata_ready.reset(metadata_token)
+        checkout_ready.reset(checkout_token)
+
+
+def _wait_for(ready: ContextVar[Future | None]):
+    future = ready.get()
+    return future.result() if future else None
+
+
+async def prepare_failed_repo(
+    repo: str,
+    commit_hash: str,
+    dbt_path: str,
+    artifacts: dict[str, Path] | None = None,
+) -> Path:
+    """Check out failed commit, then prefetch logged files while dbt metadata is built."""
+    checkout, metadata = checkout_ready.get() or Future(), dbt_metadata_ready.get() or Future()
+    try:
+        paths = asyncio.create_task(asyncio.to_thread(logged_source_paths))
+        failed_repo_path = await asyncio.to_thread(checkout_failed_commit, repo, commit_hash, dbt_path)
+        checkout.set_result(failed_repo_path)
+
+        _, installed = await asyncio.gather(
+            asyncio.to_thread(prefetch_blobs, failed_repo_path, await paths),
+            asyncio.to_thread(build_dbt_metadata, failed_repo_path, repo, commit_hash, dbt_path, artifacts),
+        )
+        metadata.set_result(installed)
+    except BaseException as exc:
+        for future in (checkout, metadata):
+            if not future.done():
+                future.set_exception(exc)
+        raise
+    return failed_repo_path
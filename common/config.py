@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import lru_cache
 from pathlib import Path
 import logging
@@ -9,6 +11,18 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 dotenv_path = Path(__file__).resolve().parents[1] / ".env"
 
+active_workspace: ContextVar[Path | None] = ContextVar("active_workspace", default=None)
+
+
+@contextmanager
+def use_workspace(workspace: Path):
+    """Route repository and log paths to a per-job workspace."""
+    token = active_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        active_workspace.reset(token)
+
 
 def parse_github_repo_link(repo_link: str | None) -> tuple[str | None, str | None]:
     """Parse repository link into namespace and repository name."""
@@ -69,6 +83,15 @@ class Config(BaseSettings):
 
     failed_repo_path: Path | None = None
 
+    worker_count: int = Field(default=1, validation_alias="WORKER_COUNT")
+    job_queue_size: int = Field(default=20, validation_alias="JOB_QUEUE_SIZE")
+    max_upload_mb: int = Field(default=512, validation_alias="MAX_UPLOAD_MB")
+    job_dedup_ttl: int = Field(default=3600, validation_alias="JOB_DEDUP_TTL")
+    context_log_max_kb: int = Field(default=256, validation_alias="CONTEXT_LOG_MAX_KB")
+    error_ledger_ttl_days: int = Field(default=30, validation_alias="ERROR_LEDGER_TTL_DAYS")
+    error_ledger_max_rows: int = Field(default=100000, validation_alias="ERROR_LEDGER_MAX_ROWS")
+    dbt_deps_cache_mb: int = Field(default=2048, validation_alias="DBT_DEPS_CACHE_MB")
+
     @field_validator("github_repo_link")
     @classmethod
     def normalize_github_link(cls, v: str) -> str:
@@ -104,15 +127,59 @@ class Config(BaseSettings):
         """Return configured GitHub repository name."""
         return self.github_owner_repo[1]
 
+    @property
+    def workspace(self) -> Path | None:
+        """Return workspace of the job being processed."""
+        return active_workspace.get()
+
     @property
     def repo_root(self) -> Path:
         """Return local path for cloned failed repository."""
+        if self.workspace:
+            return self.workspace / "repo"
         return Path.home() / ".failedrepo" / (self.github_repo or "")
 
     @property
-    def logs_file(self) -> Path:
-        """Return path to stored error hashes."""
-        return self.repo_root / "logs" / "err_hashes.txt"
+    def jobs_root(self) -> Path:
+        """Return directory for per-job workspaces."""
+        return Path.home() / ".failedrepo" / ".jobs"
+
+    @property
+    def cache_root(self) -> Path:
+        """Return directory for caches shared between jobs."""
+        return Path.home() / ".failedrepo" / ".cache"
+
+    def repo_store(self, repo: str) -> Path:
+        """Return shared bare repository for repository URL."""
+        repo_name = repo.rstrip("/").split("/")[-1].removesuffix(".git")
+        return Path.home() / ".failedrepo" / f"{repo_name}.git"
+
+    @property
+    def logs_dir(self) -> Path:
+        """Return directory for uploaded logs."""
+        if self.workspace:
+            return self.workspace / "logs"
+        return self.repo_root / "logs"
+
+    @property
+    def manifest_index_dir(self) -> Path:
+        """Return directory of compact dbt manifest indexes shared between jobs."""
+        return self.cache_root / "manifest_index"
+
+    @property
+    def symbol_index(self) -> Path:
+        """Return SQLite inverted index of symbols in dbt node sources."""
+        return self.cache_root / "symbol_index.sqlite3"
+
+    @property
+    def manifest_memo(self) -> Path:
+        """Return SQLite memo of log references resolved through dbt manifests."""
+        return self.cache_root / "manifest_references.sqlite3"
+
+    @property
+    def error_ledger(self) -> Path:
+        """Return SQLite ledger of dbt invocations seen per repository."""
+        return Path.home() / ".failedrepo" / "error_ledger.sqlite3"
 
     @property
     def dbt_log(self) -> Path:
@@ -124,7 +191,7 @@ class Config(BaseSettings):
     @property
     def uploaded_dbt_log(self) -> Path:
         """Return path to uploaded CI dbt log."""
-        return self.repo_root / "logs" / "payload_dbt.log"
+        return self.logs_dir / "payload_dbt.log"
 
     @property
     def get_profiles_path(self) -> Path:
@@ -1,2 +1,10 @@
 class DBTProfilesExistsError(Exception):
     pass
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class UploadTooLargeError(Exception):
+    pass
@@ -1,3 +1,4 @@
+from typing import Awaitable
 import logging
 import os
 import asyncio
@@ -21,6 +22,7 @@ from app.push_repo import (
     solution_files,
 )
 
+from app.jobs import job_stage
 from app.utils import scan_hashes, get_context_log
 from app.provider_builder import build_provider
 from notifier.utils import notify_about_pr
@@ -58,20 +60,35 @@ def _create_github_request(solution_parts: list[tuple[str, str]], files: str) ->
     return pull_request.html_url
 
 
-async def main() -> None:
+async def main(prepare_repo: Awaitable | None = None) -> str | None:
     """Orchestrate solution retrieval, commit, and PR creation."""
-    scan_hashes()
-    context = get_context_log()
+    preparing = asyncio.ensure_future(prepare_repo) if prepare_repo else None
+    try:
+        request_url = await _solve()
+    except BaseException:
+        if preparing:
+            await asyncio.gather(preparing, return_exceptions=True)
+        raise
+
+    if preparing:
+        await preparing
+    return request_url
+
+
+async def _solve() -> str | None:
+    with job_stage("log_scan"):
+        await asyncio.to_thread(scan_hashes)
+        context = await asyncio.to_thread(get_context_log)
     model = build_provider(
         ai_provider=config.ai_provider,
         context=context,
         ollama_type=config.ai_provider_type,
     )
-    solution = model.get_solution()
+    solution = await asyncio.to_thread(model.get_solution)
     logging.info(solution)
     if not solution.strip():
         logging.warning("No solution generated; skipping pull request creation.")
-        return
+        return None
 
     solution_parts = [
         part
@@ -80,17 +97,21 @@ async def main() -> None:
     ]
     if not solution_parts:
         logging.warning("No valid solution blocks generated; skipping pull request creation.")
-        return
+        return None
 
     files = solution_files(solution_parts)
-    if config.git_platform.lower() == "gitlab":
-        request_url = _create_gitlab_request(solution_parts, files)
-    else:
-        request_url = _create_github_request(solution_parts, files)
+    with job_stage("push"):
+        if config.git_platform.lower() == "gitlab":
+            request_url = _create_gitlab_request(solution_parts, files)
+        else:
+            request_url = _create_github_request(solution_parts, files)
 
     logging.info("Pull/merge request created successfully.")
 
-    await notify_about_pr(files, request_url)
+    with job_stage("notify"):
+        await notify_about_pr(files, request_url)
+
+    return request_url
 
 
 if __name__ == "__main__":
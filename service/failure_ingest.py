@@ -1,61 +1,163 @@
-from fastapi import FastAPI, BackgroundTasks, UploadFile, File, Form, Response
+from contextlib import asynccontextmanager
+from typing import BinaryIO
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
 import logging
+import gzip
+import shutil
 import sys
 from pathlib import Path
-import subprocess
 
-from app.utils import clone_repo_from_ci
+from app.jobs import Job, JobRegistry, JobState, failure_fingerprint
+from app.utils import DBT_ARTIFACTS, iter_log_hashes
 
 PATH = str(Path(__file__).resolve().parents[1])
 
 sys.path.append(PATH)
 
 from common.config import get_config
+from common.exceptions import JobQueueFullError, UploadTooLargeError
+from service.worker import WorkerPool
 
 config = get_config()
 
-app = FastAPI()
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+registry = JobRegistry(dedup_ttl=config.job_dedup_ttl)
+pool = WorkerPool(registry, worker_count=config.worker_count, queue_size=config.job_queue_size)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run resident worker pool for the service lifetime."""
+    pool.start()
+    yield
+    pool.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _open_upload(file: BinaryIO) -> BinaryIO:
+    """Return reader that transparently decompresses gzip or zstd uploads."""
+    head = file.read(len(ZSTD_MAGIC))
+    file.seek(0)
+
+    if head.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=file, mode="rb")
+    if head.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise HTTPException(status_code=415, detail="zstd uploads require the zstandard package") from exc
+        return zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+    return file
+
+
+def store_upload(file: BinaryIO, path: Path, max_bytes: int) -> int:
+    """Stream uploaded log to disk in chunks and enforce the size cap."""
+    written = 0
+    source = _open_upload(file)
+    try:
+        with open(path, "wb") as target:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(f"dbt log exceeds {max_bytes} bytes")
+                target.write(chunk)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    finally:
+        if source is not file:
+            source.close()
+
+    return written
+
 
 def upload_failure(
     repo: str,
     commit_hash: str,
     dbt_path: str,
-    log_file: UploadFile
-):
-    """Process uploaded CI failure in background."""
+    log_file: UploadFile,
+    artifacts: dict[str, UploadFile] | None = None,
+) -> tuple[Job, bool]:
+    """Store uploaded CI failure and queue it or attach it to a duplicate."""
+    job = Job(repo=repo, commit_hash=commit_hash, dbt_path=dbt_path)
+    job.workspace = config.jobs_root / job.id
+    job.log_path = job.workspace / "payload_dbt.log"
+    job.workspace.mkdir(parents=True, exist_ok=True)
+
     logging.info(
-        "dbt failure received: repo=%s commit=%s path=%s log=%s",
-        repo, commit_hash, dbt_path
+        "dbt failure received: job=%s repo=%s commit=%s path=%s log=%s",
+        job.id, repo, commit_hash, dbt_path, log_file.filename
     )
 
-    clone_repo_from_ci(repo, commit_hash, dbt_path, log_file)
+    max_bytes = config.max_upload_mb * 1024 * 1024
+    try:
+        store_upload(log_file.file, job.log_path, max_bytes)
+        for name, upload in (artifacts or {}).items():
+            path = job.workspace / "artifacts" / name
+            path.parent.mkdir(exist_ok=True)
+            store_upload(upload.file, path, max_bytes)
+            job.artifacts[name] = path
+        with open(job.log_path, "r", encoding="utf-8", errors="replace") as f:
+            job.fingerprint = failure_fingerprint(repo, commit_hash, iter_log_hashes(f))
+        queued = pool.submit(job)
+    except Exception:
+        shutil.rmtree(job.workspace, ignore_errors=True)
+        raise
 
-    subprocess.run(["python3", "run.py"], cwd=PATH, check=True)
+    if queued is not job:
+        shutil.rmtree(job.workspace, ignore_errors=True)
+        return queued, True
+    return job, False
 
 @app.get("/health/")
 def health():
     """Return service health status."""
     return {"status": "healer is healthy"}
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Return job state, per-stage timings and PR URL."""
+    job = registry.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@app.get("/jobs")
+def list_jobs(state: JobState | None = None):
+    """Return tracked jobs, optionally filtered by state."""
+    return [job.to_dict() for job in registry.jobs(state)]
+
 @app.post("/analyze/")
-def analyze(
-    background_tasks: BackgroundTasks,
+async def analyze(
     repo: str = Form(...),
     commit_hash: str = Form(...),
     dbt_path: str = Form(...),
     log_file: UploadFile = File(...),
+    manifest_file: UploadFile | None = File(None),
+    run_results_file: UploadFile | None = File(None),
 ):
     """Accept CI failure payload for async analysis."""
+    uploads = dict(zip(DBT_ARTIFACTS, (manifest_file, run_results_file)))
+    artifacts = {name: upload for name, upload in uploads.items() if upload and upload.filename}
     try:
-        background_tasks.add_task(
-            upload_failure,
-            repo,
-            commit_hash,
-            dbt_path,
-            log_file
-        )
-        
-        return {"status": "accepted"}
+        job, duplicate = await run_in_threadpool(upload_failure, repo, commit_hash, dbt_path, log_file, artifacts)
+
+        return {"status": "duplicate" if duplicate else "accepted", "job_id": job.id}
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        logging.warning(f"Rejecting failure: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except JobQueueFullError as e:
+        logging.warning(f"Rejecting failure: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error processing failure: {e}")
         return {"status": "error", "message": str(e)}
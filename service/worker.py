@@ -0,0 +1,89 @@
+from queue import Full, Queue
+from threading import Thread
+import asyncio
+import logging
+import shutil
+
+from app.jobs import Job, JobRegistry, track_job
+from app.utils import prepare_failed_repo, remove_repo_worktree, store_uploaded_log, track_repo_preparation
+from common.config import use_workspace
+from common.exceptions import JobQueueFullError
+from run import main
+
+
+class WorkerPool:
+    def __init__(self, registry: JobRegistry, worker_count: int = 1, queue_size: int = 20):
+        """Initialize resident worker pool with bounded job queue."""
+        self.registry = registry
+        self.worker_count = max(worker_count, 1)
+        self._queue: Queue[Job | None] = Queue(maxsize=max(queue_size, 1))
+        self._threads: list[Thread] = []
+
+    def start(self) -> None:
+        """Start worker threads."""
+        for index in range(self.worker_count - len(self._threads)):
+            thread = Thread(target=self._work, name=f"healer-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info("Started %s healer workers", len(self._threads))
+
+    def stop(self, timeout: float = 5) -> None:
+        """Ask worker threads to exit after their current job."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def submit(self, job: Job) -> Job:
+        """Register job and put it on the queue unless it duplicates another job."""
+        registered = self.registry.add(job)
+        if registered is not job:
+            logging.info("Job %s attached to in-flight or recent job %s", job.id, registered.id)
+            return registered
+
+        try:
+            self._queue.put_nowait(job)
+        except Full as exc:
+            self.registry.discard(job.id)
+            raise JobQueueFullError(f"Job queue is full ({self._queue.maxsize} pending jobs)") from exc
+        return job
+
+    def _work(self) -> None:
+        """Process queued jobs until a stop sentinel arrives."""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Job) -> None:
+        """Run repair pipeline for one job in-process."""
+        logging.info("Job %s started: repo=%s commit=%s", job.id, job.repo, job.commit_hash)
+        self.registry.mark_running(job)
+        with use_workspace(job.workspace), track_job(job), track_repo_preparation():
+            try:
+                store_uploaded_log(job.log_path)
+                pr_url = asyncio.run(
+                    main(prepare_failed_repo(job.repo, job.commit_hash, job.dbt_path, job.artifacts))
+                )
+            except Exception as exc:
+                logging.exception("Job %s failed", job.id)
+                self.registry.mark_finished(job, error=str(exc) or exc.__class__.__name__)
+            else:
+                logging.info("Job %s finished: pr=%s", job.id, pr_url)
+                self.registry.mark_finished(job, pr_url=pr_url)
+            finally:
+                self._cleanup(job)
+
+    def _cleanup(self, job: Job) -> None:
+        """Remove job worktree and workspace files."""
+        try:
+            remove_repo_worktree(job.repo)
+        except Exception as exc:
+            logging.warning("Unable to remove worktree for job %s: %s", job.id, exc)
+        if job.workspace:
+            shutil.rmtree(job.workspace, ignore_errors=True)
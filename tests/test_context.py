@@ -1,10 +1,13 @@
+import hashlib
 import json
+import subprocess
 import tempfile
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
 
 from app import context, utils
+from app.manifest import EMPTY_MANIFEST, ManifestIndex
 
 
 class DbtContextTests(unittest.TestCase):
@@ -68,93 +71,94 @@ class DbtContextTests(unittest.TestCase):
             file_path.parent.mkdir(parents=True, exist_ok=True)
             file_path.write_text(content, encoding="utf-8")
 
-        manifest_path = project_path / "target" / "manifest.json"
-        manifest_path.write_text(
-            json.dumps(
-                {
-                    "nodes": {
-                        "model.shops_dwh.mart_customer_360": {
-                            "resource_type": "model",
-                            "name": "mart_customer_360",
-                            "original_file_path": "models/mart/mart_customer_360.sql",
-                            "depends_on": {"nodes": ["model.shops_dwh.stg_customers"]},
-                        },
-                        "model.shops_dwh.stg_customers": {
-                            "resource_type": "model",
-                            "name": "stg_customers",
-                            "original_file_path": "models/stg/stg_customers.sql",
-                            "depends_on": {"nodes": ["model.shops_dwh.raw_customers"]},
-                        },
-                        "model.shops_dwh.raw_customers": {
-                            "resource_type": "model",
-                            "name": "raw_customers",
-                            "original_file_path": "models/stg/raw_customers.sql",
-                            "depends_on": {"nodes": []},
-                        },
-                        "model.shops_dwh.customer_orders": {
-                            "resource_type": "model",
-                            "name": "customer_orders",
-                            "original_file_path": "models/mart/customer_orders.sql",
-                            "depends_on": {"nodes": ["model.shops_dwh.mart_customer_360"]},
-                        },
-                        "model.shops_dwh.order_metrics": {
-                            "resource_type": "model",
-                            "name": "order_metrics",
-                            "original_file_path": "models/mart/order_metrics.sql",
-                            "depends_on": {"nodes": ["model.shops_dwh.customer_orders"]},
-                        },
-                        "model.shops_dwh.core_invoices": {
-                            "resource_type": "model",
-                            "name": "core_invoices",
-                            "original_file_path": "models/core/core_invoices.sql",
-                            "depends_on": {"nodes": []},
-                        },
-                        "model.shops_dwh.core_campaign": {
-                            "resource_type": "model",
-                            "name": "core_campaign",
-                            "original_file_path": "models/core/core_campaign.sql",
-                            "depends_on": {"nodes": []},
-                        },
-                        "test.shops_dwh.relationships_core_invoices_campaign_id__campaign_id__ref_core_campaign_.abc": {
-                            "resource_type": "test",
-                            "name": "relationships_core_invoices_campaign_id__campaign_id__ref_core_campaign_",
-                            "original_file_path": "models/core/_core_layer_doc.yml",
+        manifest = {
+            "nodes": {
+                "model.shops_dwh.mart_customer_360": {
+                    "resource_type": "model",
+                    "name": "mart_customer_360",
+                    "original_file_path": "models/mart/mart_customer_360.sql",
+                    "depends_on": {"nodes": ["model.shops_dwh.stg_customers"]},
+                },
+                "model.shops_dwh.stg_customers": {
+                    "resource_type": "model",
+                    "name": "stg_customers",
+                    "original_file_path": "models/stg/stg_customers.sql",
+                    "depends_on": {"nodes": ["model.shops_dwh.raw_customers"]},
+                },
+                "model.shops_dwh.raw_customers": {
+                    "resource_type": "model",
+                    "name": "raw_customers",
+                    "original_file_path": "models/stg/raw_customers.sql",
+                    "depends_on": {"nodes": []},
+                },
+                "model.shops_dwh.customer_orders": {
+                    "resource_type": "model",
+                    "name": "customer_orders",
+                    "original_file_path": "models/mart/customer_orders.sql",
+                    "depends_on": {"nodes": ["model.shops_dwh.mart_customer_360"]},
+                },
+                "model.shops_dwh.order_metrics": {
+                    "resource_type": "model",
+                    "name": "order_metrics",
+                    "original_file_path": "models/mart/order_metrics.sql",
+                    "depends_on": {"nodes": ["model.shops_dwh.customer_orders"]},
+                },
+                "model.shops_dwh.core_invoices": {
+                    "resource_type": "model",
+                    "name": "core_invoices",
+                    "original_file_path": "models/core/core_invoices.sql",
+                    "depends_on": {"nodes": []},
+                },
+                "model.shops_dwh.core_campaign": {
+                    "resource_type": "model",
+                    "name": "core_campaign",
+                    "original_file_path": "models/core/core_campaign.sql",
+                    "depends_on": {"nodes": []},
+                },
+                "test.shops_dwh.relationships_core_invoices_campaign_id__campaign_id__ref_core_campaign_.abc": {
+                    "resource_type": "test",
+                    "name": "relationships_core_invoices_campaign_id__campaign_id__ref_core_campaign_",
+                    "original_file_path": "models/core/_core_layer_doc.yml",
+                    "column_name": "campaign_id",
+                    "test_metadata": {
+                        "name": "relationships",
+                        "kwargs": {
                             "column_name": "campaign_id",
-                            "test_metadata": {
-                                "name": "relationships",
-                                "kwargs": {
-                                    "column_name": "campaign_id",
-                                    "field": "campaign_id",
-                                    "to": "ref('core_campaign')",
-                                },
-                            },
-                            "depends_on": {
-                                "nodes": [
-                                    "model.shops_dwh.core_invoices",
-                                    "model.shops_dwh.core_campaign",
-                                ]
-                            },
+                            "field": "campaign_id",
+                            "to": "ref('core_campaign')",
                         },
                     },
-                    "child_map": {
-                        "model.shops_dwh.mart_customer_360": ["model.shops_dwh.customer_orders"],
-                        "model.shops_dwh.stg_customers": ["model.shops_dwh.mart_customer_360"],
-                        "model.shops_dwh.raw_customers": ["model.shops_dwh.stg_customers"],
-                        "model.shops_dwh.customer_orders": ["model.shops_dwh.order_metrics"],
-                        "model.shops_dwh.order_metrics": [],
-                        "model.shops_dwh.core_invoices": [],
-                        "model.shops_dwh.core_campaign": [],
+                    "depends_on": {
+                        "nodes": [
+                            "model.shops_dwh.core_invoices",
+                            "model.shops_dwh.core_campaign",
+                        ]
                     },
-                    "macros": {},
-                }
-            ),
-            encoding="utf-8",
-        )
+                },
+            },
+            "child_map": {
+                "model.shops_dwh.mart_customer_360": ["model.shops_dwh.customer_orders"],
+                "model.shops_dwh.stg_customers": ["model.shops_dwh.mart_customer_360"],
+                "model.shops_dwh.raw_customers": ["model.shops_dwh.stg_customers"],
+                "model.shops_dwh.customer_orders": ["model.shops_dwh.order_metrics"],
+                "model.shops_dwh.order_metrics": [],
+                "model.shops_dwh.core_invoices": [],
+                "model.shops_dwh.core_campaign": [],
+            },
+            "macros": {},
+        }
+        for node in manifest["nodes"].values():
+            if node["resource_type"] == "model":
+                source = (project_path / node["original_file_path"]).read_bytes()
+                node["checksum"] = {"name": "sha256", "checksum": hashlib.sha256(source).hexdigest()}
+        (project_path / "target" / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
         utils.config = SimpleNamespace(
             dbt_project_name="shops_dwh",
             repo_root=repo_root,
             base_branch="master",
             ai_provider="Ollama",
+            manifest_index_dir=repo_root / "manifest_index",
+            symbol_index=repo_root / "symbol_index.sqlite3",
         )
         return project_path
 
@@ -182,6 +186,17 @@ class DbtContextTests(unittest.TestCase):
             self.assertIn('name="order_metrics"', result)
             self.assertIn('depth="2"', result)
             self.assertNotIn('name="stg_customers"', result)
+            self.assertIn('<DOWNSTREAM_SUMMARY total="2" by_depth="1:1,2:1" />', result)
+
+    def test_truncated_manifest_falls_back_to_empty_index(self):
+        """Check a truncated manifest is logged and skipped instead of failing the job."""
+        with tempfile.TemporaryDirectory() as tmp:
+            project_path = self._write_project(tmp)
+            manifest_path = project_path / "target" / "manifest.json"
+            manifest_path.write_text(manifest_path.read_text(encoding="utf-8")[:500], encoding="utf-8")
+
+            with self.assertLogs(level="WARNING"):
+                self.assertIs(context._read_manifest(project_path), EMPTY_MANIFEST)
 
     def test_file_context_contains_primary_error_model_and_compiled_sql(self):
         """Check primary prompt context includes source and compiled SQL."""
@@ -249,6 +264,27 @@ class DbtContextTests(unittest.TestCase):
             self.assertIn("generate_surrogate_key", result)
             self.assertIn("campaign_reporting_key", result)
 
+    def test_file_context_reads_and_scans_each_source_once(self):
+        """Check lineage, impact and primary context share source reads and node symbols."""
+        with tempfile.TemporaryDirectory() as tmp:
+            project_path = self._write_project(tmp)
+            reads = []
+            scans = []
+            original_read = context._read_file_text
+            original_symbols = context.node_symbols
+            context._read_file_text = lambda path: reads.append(path) or original_read(path)
+            context.node_symbols = lambda *args: scans.append(args[1]) or original_symbols(*args)
+            try:
+                result = context.get_file_context(str(project_path / "models/mart/mart_customer_360.sql"))
+            finally:
+                context._read_file_text = original_read
+                context.node_symbols = original_symbols
+
+            self.assertIn('name="order_metrics"', result)
+            self.assertEqual(len(reads), len(set(reads)))
+            self.assertEqual(len(scans), len(set(scans)))
+            self.assertIsNone(context.source_cache.get())
+
     def test_context_shrinks_only_for_ollama_provider(self):
         """Check RAG shrinking is skipped for non-Ollama providers."""
         with tempfile.TemporaryDirectory() as tmp:
@@ -267,5 +303,163 @@ class DbtContextTests(unittest.TestCase):
             self.assertIn("SHRUNK", result)
 
 
+class FileDiffTests(unittest.TestCase):
+    def setUp(self):
+        """Store original utils config."""
+        self.original_config = utils.config
+        self.original_run = context.subprocess.run
+
+    def tearDown(self):
+        """Restore original utils config and subprocess runner."""
+        utils.config = self.original_config
+        context.subprocess.run = self.original_run
+
+    def _git(self, *args: str, cwd: Path) -> None:
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=cwd,
+            check=True,
+            capture_output=True,
+        )
+
+    def _write_repo(self, tmp: str) -> Path:
+        repo_root = Path(tmp)
+        project_path = repo_root / "dwh"
+        files = {
+            "models/orders.sql": "select 1 as order_id",
+            "models/customers.sql": "select 1 as customer_id",
+            "models/untouched.sql": "select 1",
+        }
+        for relative_path, source in files.items():
+            (project_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+            (project_path / relative_path).write_text(source, encoding="utf-8")
+        self._git("init", "-q", cwd=repo_root)
+        self._git("add", ".", cwd=repo_root)
+        self._git("commit", "-qm", "base", cwd=repo_root)
+        (project_path / "models/orders.sql").write_text("select 2 as order_id", encoding="utf-8")
+        (project_path / "models/customers.sql").write_text(
+            "\n".join(f"select {index} as customer_id" for index in range(100)),
+            encoding="utf-8",
+        )
+        self._git("commit", "-qam", "change", cwd=repo_root)
+        utils.config = SimpleNamespace(dbt_project_name="dwh", repo_root=repo_root, base_branch="master")
+        return project_path
+
+    def test_diffs_of_all_files_come_from_one_git_diff(self):
+        """Check base revision is resolved once and one git diff is split per file and capped."""
+        with tempfile.TemporaryDirectory() as tmp:
+            project_path = self._write_repo(tmp)
+            commands = []
+            context.subprocess.run = lambda args, **kwargs: commands.append(args) or self.original_run(args, **kwargs)
+            paths = [project_path / "models" / name for name in ("orders.sql", "customers.sql", "untouched.sql")]
+
+            diffs = context._get_file_diffs(paths)
+
+        self.assertEqual(sum("diff" in command for command in commands), 1)
+        self.assertEqual(sum("rev-parse" in command for command in commands), 1)
+        self.assertEqual(set(diffs), set(paths[:2]))
+        self.assertTrue(diffs[paths[0]].startswith("diff --git a/models/orders.sql b/models/orders.sql"))
+        self.assertIn("+select 2 as order_id", diffs[paths[0]])
+        self.assertNotIn("customer_id", diffs[paths[0]])
+        self.assertIn("+select 99 as customer_id", diffs[paths[1]])
+
+        capped = context._cap_diff(diffs[paths[1]], 200)
+        self.assertLess(len(capped), len(diffs[paths[1]]))
+        self.assertTrue(capped.endswith("more characters)"))
+        self.assertTrue(diffs[paths[1]].startswith(capped.rsplit("\n", 1)[0]))
+
+
+class LineageSearchTests(unittest.TestCase):
+    def setUp(self):
+        """Create project with a wide fan-in model."""
+        self.original_config = utils.config
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project_path = Path(self.tmp.name) / "dwh"
+        nodes = {}
+        parents = []
+        for index in range(200):
+            name = f"stg_part_{index}"
+            source = f"select {index} as part_key" + " " * (4_000 if index % 2 else 0)
+            if index == 150:
+                source = "select cust_id, amount from {{ ref('raw_payments') }}"
+            nodes[f"model.dwh.{name}"] = self._model(name, source)
+            parents.append(f"model.dwh.{name}")
+        nodes["model.dwh.raw_payments"] = self._model("raw_payments", "select cust_id, amount from payments")
+        nodes["model.dwh.stg_part_150"]["depends_on"]["nodes"] = ["model.dwh.raw_payments"]
+        nodes["model.dwh.customers"] = self._model("customers", "select cust_id from unioned")
+        nodes["model.dwh.customers"]["depends_on"]["nodes"] = parents
+        self.manifest = ManifestIndex.from_manifest({"nodes": nodes})
+        utils.config = SimpleNamespace(symbol_index=Path(self.tmp.name) / "symbols.sqlite3")
+
+    def tearDown(self):
+        """Restore utils config and remove project."""
+        utils.config = self.original_config
+        self.tmp.cleanup()
+
+    def _model(self, name: str, source: str) -> dict:
+        path = self.project_path / "models" / f"{name}.sql"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source, encoding="utf-8")
+        return {
+            "resource_type": "model",
+            "name": name,
+            "original_file_path": f"models/{name}.sql",
+            "checksum": {"name": "sha256", "checksum": hashlib.sha256(source.encode()).hexdigest()},
+            "depends_on": {"nodes": []},
+        }
+
+    def _search(self, **kwargs) -> list[tuple[str, int]]:
+        expanded = []
+        original_signals = context._model_signals
+        context._model_signals = lambda path, manifest, node_id: expanded.append(node_id) or original_signals(
+            path, manifest, node_id
+        )
+        try:
+            selected = context._lineage_model_ids(
+                self.project_path,
+                self.manifest,
+                "model.dwh.customers",
+                {"cust_id", "raw_payments"},
+                "",
+                context._upstream_model_ids,
+                2,
+                kwargs.pop("max_models", 3),
+                relevance_after_first=True,
+                **kwargs,
+            )
+        finally:
+            context._model_signals = original_signals
+        self.assertEqual(expanded, [node_id for node_id, *_ in selected])
+        return [(node_id, depth) for node_id, depth, *_ in selected]
+
+    def test_most_relevant_parents_are_expanded_first(self):
+        """Check best-first search follows the relevant parent through a wide fan-in."""
+        selected = self._search()
+
+        self.assertEqual(selected[0], ("model.dwh.stg_part_150", 1))
+        self.assertEqual(selected[1], ("model.dwh.raw_payments", 2))
+        self.assertEqual(len(selected), 3)
+
+    def test_token_budget_stops_search(self):
+        """Check selection stops once the estimated token budget is spent and skips costly models."""
+        selected = self._search(max_models=10, token_budget=30)
+
+        self.assertEqual([node_id for node_id, _ in selected[:2]], ["model.dwh.stg_part_150", "model.dwh.raw_payments"])
+        self.assertTrue(all(int(node_id.rsplit("_", 1)[-1]) % 2 == 0 for node_id, _ in selected[2:]))
+        self.assertLess(len(selected), 10)
+
+    def test_relevant_parent_over_budget_is_still_selected_first(self):
+        """Check a relevant parent larger than the whole budget outranks small irrelevant ones."""
+        source = "select cust_id, amount from {{ ref('raw_payments') }}\n" + "-- padding\n" * 6_000
+        path = self.project_path / "models" / "stg_part_150.sql"
+        path.write_text(source, encoding="utf-8")
+        node = self.manifest.nodes["model.dwh.stg_part_150"]
+        node.checksum = hashlib.sha256(source.encode()).hexdigest()
+
+        selected = self._search(max_models=10, token_budget=1_000)
+
+        self.assertEqual(selected, [("model.dwh.stg_part_150", 1)])
+
+
 if __name__ == "__main__":
     unittest.main()
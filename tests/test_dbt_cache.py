@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from app import dbt_cache
+from app.dbt_cache import PARTIAL_PARSE_FILE, DirectoryCache, PartialParseStore, install_dbt_packages
+
+
+class InstallDbtPackagesTests(unittest.TestCase):
+    def setUp(self):
+        """Create project and cache directories and fake dbt deps."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = DirectoryCache(self.root / "cache", max_bytes=1024 * 1024)
+        self.deps_runs = []
+        self.original_run = dbt_cache.subprocess.run
+
+        def fake_run(args, cwd, check):
+            self.deps_runs.append(cwd)
+            package = Path(cwd) / "dbt_packages" / "dbt_utils"
+            package.mkdir(parents=True)
+            (package / "dbt_project.yml").write_text("name: dbt_utils\n", encoding="utf-8")
+
+        dbt_cache.subprocess.run = fake_run
+
+    def tearDown(self):
+        """Restore subprocess and remove temporary directories."""
+        dbt_cache.subprocess.run = self.original_run
+        self.tmp.cleanup()
+
+    def _project(self, name: str, packages: str = "packages:\n  - package: dbt-labs/dbt_utils\n") -> Path:
+        project = self.root / name
+        project.mkdir()
+        (project / "dbt_project.yml").write_text("name: dwh\n", encoding="utf-8")
+        (project / "packages.yml").write_text(packages, encoding="utf-8")
+        return project
+
+    def test_same_package_files_reuse_cached_packages(self):
+        """Check second project with identical package files skips dbt deps."""
+        first = self._project("first")
+        second = self._project("second")
+
+        install_dbt_packages(first, self.cache)
+        install_dbt_packages(second, self.cache)
+
+        self.assertEqual(self.deps_runs, [first])
+        self.assertTrue((second / "dbt_packages").is_symlink())
+        self.assertTrue((second / "dbt_packages" / "dbt_utils" / "dbt_project.yml").exists())
+
+    def test_changed_package_files_run_dbt_deps(self):
+        """Check edited packages.yml produces a new cache entry."""
+        install_dbt_packages(self._project("first"), self.cache)
+        install_dbt_packages(self._project("second", packages="packages: []\n"), self.cache)
+
+        self.assertEqual(len(self.deps_runs), 2)
+
+    def test_custom_packages_install_path_is_linked(self):
+        """Check packages-install-path from dbt_project.yml is honored."""
+        project = self._project("first")
+        (project / "dbt_project.yml").write_text("name: dwh\npackages-install-path: vendor\n", encoding="utf-8")
+
+        self.assertEqual(dbt_cache.packages_install_path(project), project / "vendor")
+
+
+class DirectoryCacheTests(unittest.TestCase):
+    def test_least_recently_used_entries_are_evicted_over_size_limit(self):
+        """Check eviction removes oldest unused entries until cache fits."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            cache = DirectoryCache(root / "cache", max_bytes=350)
+            for index, key in enumerate(["a", "b", "c"]):
+                source = root / key
+                source.mkdir()
+                (source / "data").write_bytes(b"x" * 100)
+                cache.put(key, source)
+                os.utime(cache._size_file(key), (index, index))
+            cache.get("a")
+
+            source = root / "d"
+            source.mkdir()
+            (source / "data").write_bytes(b"x" * 100)
+            cache.put("d", source)
+
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+            self.assertIsNotNone(cache.get("d"))
+
+    def test_entries_linked_by_live_holders_are_not_evicted(self):
+        """Check eviction skips entries a worktree still links to and drops them once the link is gone."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            cache = DirectoryCache(root / "cache", max_bytes=250)
+            holder = root / "worktree" / "dbt_packages"
+            for index, key in enumerate(["a", "b"]):
+                source = root / key
+                source.mkdir()
+                (source / "data").write_bytes(b"x" * 100)
+                cache.put(key, source)
+                os.utime(cache._size_file(key), (index, index))
+            cache.link("a", holder)
+            os.utime(cache._size_file("a"), (0, 0))
+
+            source = root / "c"
+            source.mkdir()
+            (source / "data").write_bytes(b"x" * 100)
+            cache.put("c", source)
+
+            self.assertEqual((holder / "data").read_bytes(), b"x" * 100)
+            self.assertIsNone(cache.get("b"))
+
+            holder.unlink()
+            source = root / "d"
+            source.mkdir()
+            (source / "data").write_bytes(b"x" * 100)
+            cache.put("d", source)
+
+            self.assertIsNone(cache.get("a"))
+            self.assertFalse(cache._leases("a").exists())
+            self.assertIsNotNone(cache.get("d"))
+
+
+class PartialParseStoreTests(unittest.TestCase):
+    def setUp(self):
+        """Create project with partial parse state and isolated profiles dir."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.original_profiles_dir = os.environ.get("DBT_PROFILES_DIR")
+        os.environ["DBT_PROFILES_DIR"] = str(self.root / "profiles")
+        self.store = PartialParseStore(self.root / "cache")
+
+    def tearDown(self):
+        """Restore environment and remove temporary directories."""
+        if self.original_profiles_dir is None:
+            os.environ.pop("DBT_PROFILES_DIR", None)
+        else:
+            os.environ["DBT_PROFILES_DIR"] = self.original_profiles_dir
+        self.tmp.cleanup()
+
+    def _project(self, name: str) -> Path:
+        project = self.root / name
+        project.mkdir()
+        (project / "dbt_project.yml").write_text("name: dwh\n", encoding="utf-8")
+        return project
+
+    def test_saved_state_is_restored_into_new_checkout(self):
+        """Check partial parse state from one job is copied into the next."""
+        first = self._project("first")
+        (first / "target").mkdir()
+        (first / "target" / PARTIAL_PARSE_FILE).write_bytes(b"state")
+        self.store.save("dwh.git/dwh", first)
+        second = self._project("second")
+
+        self.assertTrue(self.store.restore("dwh.git/dwh", second))
+        self.assertEqual((second / "target" / PARTIAL_PARSE_FILE).read_bytes(), b"state")
+        self.assertFalse(self.store.restore("other.git/dwh", second))
+
+    def test_changed_project_settings_invalidate_state(self):
+        """Check edits to dbt_project.yml or profiles discard saved state."""
+        first = self._project("first")
+        (first / "target").mkdir()
+        (first / "target" / PARTIAL_PARSE_FILE).write_bytes(b"state")
+        self.store.save("dwh.git/dwh", first)
+
+        second = self._project("second")
+        (second / "dbt_project.yml").write_text("name: dwh\nvars: {x: 1}\n", encoding="utf-8")
+        self.assertFalse(self.store.restore("dwh.git/dwh", second))
+
+        (self.root / "profiles").mkdir()
+        (self.root / "profiles" / "profiles.yml").write_text("dwh: {}\n", encoding="utf-8")
+        self.assertFalse(self.store.restore("dwh.git/dwh", first))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import re
+import time
+import unittest
+
+from app.dbt_exps import DBT_SOURCE_DIRS, DBT_SOURCE_EXTENSIONS, MAX_LOG_LINE_CHARS, DbtRegularExpressions
+from app.log_scanner import iter_failure_events
+from app.utils import _normalize_dbt_source_path
+
+FLAGS = re.IGNORECASE | re.VERBOSE
+
+# Patterns as they were before matching was made linear; used as the reference semantics.
+LEGACY_STATUS_MODEL_RE = re.compile(r"""
+    \b ERROR \b
+    [^\n]*
+    \b model \s+
+    (?P<relation>[A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)?)
+""", FLAGS)
+LEGACY_NATURAL_MODEL_RE = re.compile(r"""
+    \b error \b
+    [^\n]{0,200}
+    \b (?:in|for|from) \s+
+    (?:the \s+)?
+    (?P<name>[A-Za-z_][\w$]*) \s+ (?:model|macro) \b
+""", FLAGS)
+LEGACY_SOURCE_PATH_RE = re.compile(rf"""
+    (?P<path>
+        (?:[A-Za-z]:)?
+        /?
+        (?:[\w.@+ -]+/)*
+        (?:{"|".join(map(re.escape, DBT_SOURCE_DIRS))})/
+        [\w.@+ /-]+
+        \.
+        (?:{"|".join(re.escape(ext.lstrip(".")) for ext in DBT_SOURCE_EXTENSIONS)})
+    )
+""", FLAGS)
+LEGACY_ERROR_RE = re.compile(r"""
+    \b
+    (?:Database|Compilation|Runtime|Parsing) \s+ Error \s+ in \s+
+    (?:sql \s+)?
+    (?P<resource>model|snapshot|seed|macro) \s+
+    (?P<name>[\w.$-]+)
+    (?: \s+ \( (?P<path> [^)\n]+ ) \) )?
+""", FLAGS)
+
+# Source directories are generated in lower case: an upper-case directory is not a
+# repository path, and the legacy pattern kept arbitrary prefixes in front of it.
+TOKENS = [
+    *DBT_SOURCE_DIRS, "/", "/", "/", ".", ".sql", ".SQL", ".yml", ".yaml", " ", " ", "  ",
+    "error", "ERROR", "Error", "model", "macro", "in", "for", "from", "the", "Database Error in model",
+    "customers", "stg_orders", " in the ", " orders model", "a", "x1", "my", "C:", "(", ")", ",", "-", "@", "+", "$", "\t", "analytics.",
+]
+
+ADVERSARIAL_LINES = [
+    "models/" + "a/" * 50_000,
+    "a/" * 50_000 + "models",
+    "models/" + "x " * 50_000,
+    "ERROR " * 20_000,
+    "error in " * 20_000,
+    "ERROR model " + "a" * 100_000,
+    "Database Error in model " + "(" * 50_000,
+    ("select " + "col_name, " * 5_000 + "from models/source") * 4,
+]
+
+
+class LinearDbtPatternTests(unittest.TestCase):
+    def setUp(self):
+        """Create patterns and deterministic generator."""
+        self.exp = DbtRegularExpressions()
+        self.random = random.Random(20240601)
+
+    def _line(self) -> str:
+        return "".join(self.random.choice(TOKENS) for _ in range(self.random.randint(1, 40)))
+
+    def test_fuzzed_lines_match_legacy_semantics(self):
+        """Check rewritten patterns find the same references as the legacy ones."""
+        for _ in range(5_000):
+            line = self._line()
+            with self.subTest(line=line):
+                self.assertEqual(
+                    [_normalize_dbt_source_path(path) for path in self.exp.iter_source_paths(line)],
+                    [_normalize_dbt_source_path(match.group("path")) for match in LEGACY_SOURCE_PATH_RE.finditer(line)],
+                )
+                legacy_status = [match.group("relation") for match in LEGACY_STATUS_MODEL_RE.finditer(line)]
+                self.assertEqual(self.exp.status_model(line), legacy_status[0] if legacy_status else None)
+                self.assertEqual(
+                    [match.group("name") for match in self.exp.DBT_NATURAL_MODEL_RE.finditer(line)],
+                    [match.group("name") for match in LEGACY_NATURAL_MODEL_RE.finditer(line)],
+                )
+                self.assertEqual(
+                    [match.groupdict() for match in self.exp.DBT_ERROR_RE.finditer(line)],
+                    [match.groupdict() for match in LEGACY_ERROR_RE.finditer(line)],
+                )
+
+    def test_adversarial_lines_scan_in_linear_time(self):
+        """Check pathological lines cannot pin a worker on regex backtracking."""
+        for line in ADVERSARIAL_LINES:
+            with self.subTest(line=line[:40]):
+                started = time.perf_counter()
+                list(self.exp.iter_source_paths(line))
+                self.exp.status_model(line)
+                list(self.exp.DBT_NATURAL_MODEL_RE.finditer(line))
+                list(self.exp.DBT_ERROR_RE.finditer(line))
+                self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_log_scanner_throughput(self):
+        """Check scanner keeps a minimum throughput on a realistic log with long lines."""
+        block = [
+            "10:00:00  Running with dbt=1.8.0",
+            "10:00:01  1 of 3 START sql view model analytics.stg_orders ..... [RUN]",
+            "10:00:02  Database Error in model customers (models/core/customers.sql)",
+            "10:00:02    column \"amount\" does not exist",
+            "10:00:02    compiled code at target/run/dwh/models/core/customers.sql",
+            "select " + "col_name, " * 500 + "1 from analytics.orders",
+        ]
+        lines = block * 2_000
+        size = sum(len(line) + 1 for line in lines)
+
+        started = time.perf_counter()
+        events = sum(1 for _ in iter_failure_events(lines))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(events, 2_000 * 4)
+        self.assertGreater(size / elapsed, 5 * 1024 * 1024)
+
+    def test_long_lines_are_capped(self):
+        """Check references past the per-line cap are ignored."""
+        line = "x" * MAX_LOG_LINE_CHARS + " Database Error in model customers"
+
+        self.assertEqual(list(iter_failure_events(line)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.jobs import JobRegistry, job_stage, track_job
+from service import failure_ingest
+
+SEPARATOR = "============================== 10:00:00.000000 | {} ==============================\n"
+
+
+class FakePool:
+    def __init__(self):
+        """Collect submitted jobs without running them."""
+        self.registry = JobRegistry()
+        self.jobs = []
+
+    def submit(self, job):
+        """Register job and copy its uploaded log."""
+        registered = self.registry.add(job)
+        if registered is job:
+            job.log_text = job.log_path.read_text(encoding="utf-8")
+            self.jobs.append(job)
+        return registered
+
+
+class AnalyzeEndpointTests(unittest.TestCase):
+    def setUp(self):
+        """Point ingest at a temporary jobs directory and fake pool."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.original_config = failure_ingest.config
+        self.original_pool = failure_ingest.pool
+        self.original_registry = failure_ingest.registry
+        failure_ingest.config = SimpleNamespace(jobs_root=Path(self.tmp.name), max_upload_mb=1)
+        failure_ingest.pool = FakePool()
+        failure_ingest.registry = failure_ingest.pool.registry
+        self.client = TestClient(failure_ingest.app)
+
+    def tearDown(self):
+        """Restore ingest state."""
+        failure_ingest.config = self.original_config
+        failure_ingest.pool = self.original_pool
+        failure_ingest.registry = self.original_registry
+        self.tmp.cleanup()
+
+    def _post(self, content: bytes):
+        return self.client.post(
+            "/analyze/",
+            data={"repo": "https://github.com/org/dwh.git", "commit_hash": "abc123", "dbt_path": "dwh"},
+            files={"log_file": ("dbt.log", content)},
+        )
+
+    def test_plain_upload_is_queued(self):
+        """Check plain dbt log is stored and queued."""
+        response = self._post(b"Database Error in model customers (models/customers.sql)")
+
+        self.assertEqual(response.status_code, 200)
+        job = failure_ingest.pool.jobs[0]
+        self.assertEqual(response.json(), {"status": "accepted", "job_id": job.id})
+        self.assertIn("models/customers.sql", job.log_text)
+
+    def test_gzip_upload_is_decompressed(self):
+        """Check gzip-compressed dbt log is decompressed while streaming."""
+        response = self._post(gzip.compress(b"Failure in test unique_customers_id"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(failure_ingest.pool.jobs[0].log_text, "Failure in test unique_customers_id")
+
+    def test_duplicate_submission_returns_existing_job(self):
+        """Check retries of the same failure attach to the first job."""
+        log = (SEPARATOR.format("inv-1") + "Database Error in model customers").encode("utf-8")
+        first = self._post(log)
+        second = self._post(log)
+
+        self.assertEqual(second.json(), {"status": "duplicate", "job_id": first.json()["job_id"]})
+        self.assertEqual(len(failure_ingest.pool.jobs), 1)
+        self.assertEqual(failure_ingest.pool.jobs[0].duplicates, 1)
+        self.assertEqual(len(list(Path(self.tmp.name).iterdir())), 1)
+
+    def test_different_error_hashes_start_new_job(self):
+        """Check a new dbt invocation on the same commit is not coalesced."""
+        self._post((SEPARATOR.format("inv-1") + "error").encode("utf-8"))
+        response = self._post((SEPARATOR.format("inv-2") + "error").encode("utf-8"))
+
+        self.assertEqual(response.json()["status"], "accepted")
+        self.assertEqual(len(failure_ingest.pool.jobs), 2)
+
+    def test_job_status_reports_stages_and_state_filter(self):
+        """Check job endpoints expose stage timings and filter by state."""
+        job_id = self._post(b"error").json()["job_id"]
+        job = failure_ingest.registry.get(job_id)
+        with track_job(job), job_stage("clone"):
+            pass
+        failure_ingest.registry.mark_finished(job, pr_url="https://github.com/org/dwh/pull/1")
+
+        status = self.client.get(f"/jobs/{job_id}").json()
+
+        self.assertEqual(status["state"], "succeeded")
+        self.assertEqual(status["pr_url"], "https://github.com/org/dwh/pull/1")
+        self.assertIsNotNone(status["stages"]["clone"]["finished_at"])
+        self.assertEqual([item["id"] for item in self.client.get("/jobs?state=succeeded").json()], [job_id])
+        self.assertEqual(self.client.get("/jobs?state=running").json(), [])
+        self.assertEqual(self.client.get("/jobs/missing").status_code, 404)
+
+    def test_dbt_artifacts_are_stored_with_job(self):
+        """Check optional manifest and run results uploads are kept in the job workspace."""
+        response = self.client.post(
+            "/analyze/",
+            data={"repo": "https://github.com/org/dwh.git", "commit_hash": "abc123", "dbt_path": "dwh"},
+            files={
+                "log_file": ("dbt.log", b"error"),
+                "manifest_file": ("manifest.json", gzip.compress(b'{"metadata": {}}')),
+            },
+        )
+
+        job = failure_ingest.registry.get(response.json()["job_id"])
+        self.assertEqual(list(job.artifacts), ["manifest.json"])
+        self.assertEqual(job.artifacts["manifest.json"].read_bytes(), b'{"metadata": {}}')
+
+    def test_upload_over_cap_is_rejected(self):
+        """Check oversized logs are rejected and not left on disk."""
+        response = self._post(gzip.compress(b"x" * (2 * 1024 * 1024)))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(failure_ingest.pool.jobs, [])
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
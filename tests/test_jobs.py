@@ -0,0 +1,146 @@
+import unittest
+
+from app.jobs import Job, JobRegistry, JobState, failure_fingerprint, job_stage, track_job
+from common.exceptions import JobQueueFullError
+from service import worker
+
+
+class WorkerPoolTests(unittest.TestCase):
+    def setUp(self):
+        """Replace pipeline steps with in-memory fakes."""
+        self.original_prepare = worker.prepare_failed_repo
+        self.original_store_log = worker.store_uploaded_log
+        self.original_main = worker.main
+        self.original_remove_worktree = worker.remove_repo_worktree
+        self.calls = []
+        worker.store_uploaded_log = lambda log_path: None
+        worker.remove_repo_worktree = lambda repo: None
+
+        async def fake_prepare(repo, commit_hash, dbt_path, artifacts):
+            self.calls.append(("clone", commit_hash))
+
+        async def fake_main(prepare_repo):
+            await prepare_repo
+            self.calls.append(("main", None))
+
+        worker.prepare_failed_repo = fake_prepare
+
+        worker.main = fake_main
+
+    def tearDown(self):
+        """Restore pipeline steps."""
+        worker.prepare_failed_repo = self.original_prepare
+        worker.store_uploaded_log = self.original_store_log
+        worker.main = self.original_main
+        worker.remove_repo_worktree = self.original_remove_worktree
+
+    def test_submit_rejects_jobs_over_queue_size(self):
+        """Check bounded queue rejects extra jobs and forgets them."""
+        registry = JobRegistry()
+        pool = worker.WorkerPool(registry, worker_count=1, queue_size=1)
+        first = pool.submit(Job(repo="repo", commit_hash="a1", dbt_path="dwh"))
+        second = Job(repo="repo", commit_hash="b2", dbt_path="dwh")
+
+        with self.assertRaises(JobQueueFullError):
+            pool.submit(second)
+
+        self.assertIs(registry.get(first.id), first)
+        self.assertIsNone(registry.get(second.id))
+
+    def test_workers_run_pipeline_in_process(self):
+        """Check queued job runs clone and main and is marked succeeded."""
+        registry = JobRegistry()
+        pool = worker.WorkerPool(registry, worker_count=2, queue_size=4)
+        job = pool.submit(Job(repo="repo", commit_hash="a1", dbt_path="dwh"))
+
+        pool.start()
+        pool._queue.join()
+        pool.stop()
+
+        self.assertEqual(job.state, JobState.SUCCEEDED)
+        self.assertEqual(self.calls, [("clone", "a1"), ("main", None)])
+
+    def test_failed_pipeline_marks_job_failed(self):
+        """Check pipeline errors are recorded on the job."""
+        async def broken_prepare(*args):
+            raise RuntimeError("clone failed")
+
+        worker.prepare_failed_repo = broken_prepare
+        registry = JobRegistry()
+        pool = worker.WorkerPool(registry, worker_count=1, queue_size=1)
+        job = pool.submit(Job(repo="repo", commit_hash="a1", dbt_path="dwh"))
+
+        pool.start()
+        pool._queue.join()
+        pool.stop()
+
+        self.assertEqual(job.state, JobState.FAILED)
+        self.assertEqual(job.error, "clone failed")
+
+
+class JobRegistryTests(unittest.TestCase):
+    def _job(self, commit_hash: str = "a1") -> Job:
+        return Job(
+            repo="https://github.com/org/dwh.git",
+            commit_hash=commit_hash,
+            dbt_path="dwh",
+            fingerprint=failure_fingerprint("https://github.com/org/dwh", commit_hash, ["inv-1"]),
+        )
+
+    def test_fingerprint_ignores_repo_url_suffix_and_hash_order(self):
+        """Check equivalent submissions share a fingerprint."""
+        self.assertEqual(
+            failure_fingerprint("https://github.com/Org/dwh.git", "ABC", ["b", "a"]),
+            failure_fingerprint("https://github.com/org/dwh/", "abc", ["a", "b", "a"]),
+        )
+
+    def test_duplicate_attaches_to_recent_success(self):
+        """Check duplicate of a recently finished job returns that job."""
+        registry = JobRegistry(dedup_ttl=60)
+        first = registry.add(self._job())
+        registry.mark_finished(first)
+
+        self.assertIs(registry.add(self._job()), first)
+        self.assertEqual(first.duplicates, 1)
+
+    def test_failed_or_expired_jobs_are_not_reused(self):
+        """Check failed jobs and jobs past the dedup TTL allow new work."""
+        registry = JobRegistry(dedup_ttl=60)
+        failed = registry.add(self._job())
+        registry.mark_finished(failed, error="boom")
+        retried = self._job()
+
+        self.assertIs(registry.add(retried), retried)
+
+        registry.mark_finished(retried)
+        retried.finished_at -= 120
+        fresh = self._job()
+
+        self.assertIs(registry.add(fresh), fresh)
+
+
+class JobStageTests(unittest.TestCase):
+    def test_repeated_stage_accumulates_duration(self):
+        """Check stages run several times keep first start and total duration."""
+        job = Job(repo="repo", commit_hash="a1", dbt_path="dwh")
+        with track_job(job):
+            with job_stage("context"):
+                pass
+            started_at = job.stages["context"].started_at
+            with job_stage("context"):
+                pass
+            with job_stage("llm"):
+                pass
+
+        self.assertEqual(list(job.stages), ["context", "llm"])
+        self.assertEqual(job.stages["context"].started_at, started_at)
+        self.assertEqual(job.stage, "llm")
+
+    def test_stage_without_job_is_noop(self):
+        """Check stage tracking is ignored outside worker jobs."""
+        with job_stage("clone"):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
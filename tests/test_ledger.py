@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app import ledger
+from app.ledger import ErrorLedger
+
+
+class ErrorLedgerTests(unittest.TestCase):
+    def setUp(self):
+        """Create ledger in a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "error_ledger.sqlite3"
+        self.ledger = ErrorLedger(self.path, ttl_seconds=3600, max_rows=100)
+
+    def tearDown(self):
+        """Remove ledger files."""
+        self.tmp.cleanup()
+
+    def test_record_returns_only_unseen_invocations_per_repo(self):
+        """Check invocations are deduplicated per repository."""
+        self.assertEqual(self.ledger.record("org/dwh", "job-1", ["inv-1", "inv-2", "inv-1"]), ["inv-1", "inv-2"])
+        self.assertEqual(self.ledger.record("org/dwh", "job-2", ["inv-2", "inv-3"]), ["inv-3"])
+        self.assertEqual(self.ledger.record("org/other", "job-3", ["inv-2"]), ["inv-2"])
+
+    def test_latest_prefers_job_then_repository(self):
+        """Check latest invocation follows the job's log order and falls back to the repo."""
+        self.ledger.record("org/dwh", "job-1", ["inv-1", "inv-2"])
+        self.ledger.record("org/dwh", "job-2", ["inv-3", "inv-1"])
+
+        self.assertEqual(self.ledger.latest("org/dwh", "job-2"), "inv-1")
+        self.assertEqual(self.ledger.latest("org/dwh", "job-1"), "inv-2")
+        self.assertEqual(self.ledger.latest("org/dwh", "job-9"), "inv-1")
+        self.assertIsNone(self.ledger.latest("org/other"))
+
+    def test_compaction_drops_expired_and_oldest_rows(self):
+        """Check TTL and row cap keep the ledger bounded."""
+        original_time = ledger.time.time
+        try:
+            ledger.time.time = lambda: 1_000.0
+            self.ledger.record("org/dwh", "job-1", ["old"])
+            ledger.time.time = lambda: 10_000.0
+            bounded = ErrorLedger(self.path, ttl_seconds=3600, max_rows=3)
+            bounded.record("org/dwh", "job-2", [f"inv-{index}" for index in range(5)])
+        finally:
+            ledger.time.time = original_time
+
+        self.assertEqual(bounded.record("org/dwh", "job-3", ["old", "inv-0", "inv-4"]), ["old", "inv-0"])
+
+    def test_concurrent_jobs_record_without_losing_rows(self):
+        """Check parallel writers share the ledger safely."""
+        def record(index: int) -> list[str]:
+            return self.ledger.record("org/dwh", f"job-{index}", [f"inv-{index}", "shared"])
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            new = [item for items in pool.map(record, range(16)) for item in items]
+
+        self.assertEqual(new.count("shared"), 1)
+        self.assertEqual(len(new), 17)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.log_scanner import FailureEvent, FailureKind, collect_failure_events, iter_failure_events
+
+
+class FailureEventTests(unittest.TestCase):
+    def test_events_carry_kind_reference_and_line(self):
+        """Check scanner yields typed events with their log line."""
+        log = (
+            "10:00:00  Running with dbt=1.8.0\n"
+            "\x1b[31m10:00:01  Database Error in model customers (models/core/customers.sql)\x1b[0m\n"
+            "10:00:02  Failure in test unique_orders_id (models/schema.yml)\n"
+        )
+
+        events = list(iter_failure_events(log))
+
+        self.assertIn(
+            FailureEvent(FailureKind.ERROR, "model", "customers", "models/core/customers.sql", 2),
+            events,
+        )
+        self.assertIn(
+            FailureEvent(FailureKind.FAILURE, "test", "unique_orders_id", "models/schema.yml", 3),
+            events,
+        )
+        self.assertEqual(
+            [event.path for event in events if event.kind is FailureKind.SOURCE_PATH],
+            ["models/core/customers.sql", "models/schema.yml"],
+        )
+
+    def test_scans_open_log_file_line_by_line(self):
+        """Check scanner accepts a file object and keeps log order per kind."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dbt.log"
+            path.write_text(
+                "ERROR creating sql view model analytics.orders\n"
+                "noise\n"
+                "Compilation Error in macro cents_to_dollars (macros/cents.sql)\n"
+                "Runtime Error in model payments\n",
+                encoding="utf-8",
+            )
+            with path.open("r", encoding="utf-8") as f:
+                events = collect_failure_events(f)
+
+        self.assertEqual([event.name for event in events[FailureKind.ERROR]], ["cents_to_dollars", "payments"])
+        self.assertEqual([event.line for event in events[FailureKind.ERROR]], [3, 4])
+        self.assertEqual(events[FailureKind.STATUS_MODEL][0].name, "analytics.orders")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,291 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from app import manifest, utils
+from app.manifest import ManifestIndex, ReferenceMemo, load_manifest_index
+
+MANIFEST = {
+    "nodes": {
+        "seed.dwh.countries": {
+            "resource_type": "seed",
+            "name": "countries",
+            "original_file_path": "seeds/countries.csv",
+        },
+        "model.dwh.customers": {
+            "resource_type": "model",
+            "name": "customers",
+            "alias": "dim_customers",
+            "original_file_path": "models\\core\\customers.sql",
+        },
+        "model.dwh.orders": {
+            "resource_type": "model",
+            "name": "orders",
+            "original_file_path": "models/core/orders.sql",
+        },
+        "test.dwh.unique_customers_id.abc123": {
+            "resource_type": "test",
+            "name": "unique_customers_id",
+            "alias": "uq_customers",
+            "original_file_path": "models/core/_core.yml",
+        },
+        "analysis.dwh.customers": {
+            "resource_type": "analysis",
+            "name": "customers",
+            "original_file_path": "analyses/customers.sql",
+        },
+    },
+    "macros": {
+        "macro.dwh.cents_to_dollars": {"name": "cents_to_dollars", "original_file_path": "macros/cents.sql"},
+        "macro.dbt_utils.star": {"name": "star", "original_file_path": "macros/star.sql"},
+        "macro.dwh.star": {"name": "star", "original_file_path": "macros/star_override.sql"},
+    },
+}
+
+
+class ManifestIndexTests(unittest.TestCase):
+    def setUp(self):
+        """Build index of sample manifest."""
+        self.index = ManifestIndex.from_manifest(MANIFEST)
+
+    def test_finds_models_by_path_name_and_stem(self):
+        """Check model lookup matches path, name and file stem of model types only."""
+        self.assertEqual(self.index.find_model("models/core/customers.sql")[0], "model.dwh.customers")
+        self.assertEqual(self.index.find_model("models\\core\\orders.sql")[0], "model.dwh.orders")
+        self.assertEqual(self.index.find_model("analyses/customers.sql")[0], "model.dwh.customers")
+        self.assertEqual(self.index.find_model("countries")[0], "seed.dwh.countries")
+        self.assertEqual(self.index.find_model("models/unknown.sql"), (None, None))
+
+    def test_finds_tests_by_name_alias_and_id_segment(self):
+        """Check test lookup matches name, alias and unique id segments."""
+        for name in ("unique_customers_id", "uq_customers", "abc123"):
+            with self.subTest(name=name):
+                self.assertEqual(self.index.find_test(name)[0], "test.dwh.unique_customers_id.abc123")
+        self.assertEqual(self.index.find_test("dwh.unique"), (None, None))
+
+    def test_records_keep_only_context_fields(self):
+        """Check node records drop code and docs and keep dependencies as tuples."""
+        node = ManifestIndex.from_manifest(
+            {
+                "nodes": {
+                    "model.dwh.orders": {
+                        "resource_type": "model",
+                        "name": "orders",
+                        "raw_code": "select 1",
+                        "depends_on": {"nodes": ["model.dwh.stg_orders"], "macros": ["macro.dwh.cents"]},
+                    }
+                }
+            }
+        ).nodes["model.dwh.orders"]
+
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(node, "raw_code"))
+        self.assertEqual(node.depends_on, ("model.dwh.stg_orders",))
+        self.assertEqual(node.depends_on_macros, ("macro.dwh.cents",))
+
+    @unittest.skipUnless(manifest.ijson, "ijson is not installed")
+    def test_streamed_index_matches_parsed_index(self):
+        """Check streaming loader builds the same lookups as the json loader in one pass."""
+        data = dict(
+            MANIFEST,
+            metadata={"nodes": {"model.dwh.metadata": {"resource_type": "model"}}},
+            child_map={"model.dwh.customers": ["model.dwh.orders"]},
+        )
+        f = io.BytesIO(json.dumps(data).encode())
+        f.seek = lambda *args: self.fail("manifest was read more than once")
+        streamed = ManifestIndex.stream(f)
+
+        self.assertEqual(list(streamed.nodes), list(MANIFEST["nodes"]))
+        self.assertEqual(streamed.find_model("customers")[0], "model.dwh.customers")
+        self.assertEqual(streamed.find_test("uq_customers")[0], "test.dwh.unique_customers_id.abc123")
+        self.assertEqual(streamed.child_map, {"model.dwh.customers": ("model.dwh.orders",)})
+
+    def test_macro_ids_keep_manifest_order(self):
+        """Check macro lookup returns every macro with a requested name in manifest order."""
+        self.assertEqual(
+            self.index.macro_ids({"star", "cents_to_dollars", "missing"}),
+            ["macro.dwh.cents_to_dollars", "macro.dbt_utils.star", "macro.dwh.star"],
+        )
+
+
+class ModelLineageTests(unittest.TestCase):
+    def setUp(self):
+        """Build index with a diamond of models, a test and a source."""
+        def model(*parents):
+            return {"resource_type": "model", "depends_on": {"nodes": list(parents)}}
+
+        self.index = ManifestIndex.from_manifest(
+            {
+                "nodes": {
+                    "model.dwh.a": model("source.dwh.raw.a"),
+                    "model.dwh.b": model("model.dwh.a"),
+                    "model.dwh.c": model("model.dwh.a"),
+                    "model.dwh.d": model("model.dwh.b", "model.dwh.c"),
+                    "test.dwh.not_null_d": {"resource_type": "test", "depends_on": {"nodes": ["model.dwh.d"]}},
+                },
+                "sources": {"source.dwh.raw.a": {"resource_type": "source"}},
+                "child_map": {
+                    "source.dwh.raw.a": ["model.dwh.a"],
+                    "model.dwh.a": ["model.dwh.b", "model.dwh.c"],
+                    "model.dwh.b": ["model.dwh.d"],
+                    "model.dwh.c": ["model.dwh.d"],
+                    "model.dwh.d": ["test.dwh.not_null_d"],
+                },
+            }
+        )
+
+    def test_neighbours_are_filtered_to_models_in_manifest_order(self):
+        """Check parent and child lists skip sources and tests."""
+        self.assertEqual(self.index.parent_models("model.dwh.a"), [])
+        self.assertEqual(self.index.parent_models("model.dwh.d"), ["model.dwh.b", "model.dwh.c"])
+        self.assertEqual(self.index.child_models("model.dwh.a"), ["model.dwh.b", "model.dwh.c"])
+        self.assertEqual(self.index.child_models("model.dwh.d"), [])
+        self.assertEqual(self.index.child_models("test.dwh.not_null_d"), [])
+
+    def test_downstream_counts_visit_each_model_once(self):
+        """Check downstream counts are per depth and do not count diamond paths twice."""
+        self.assertEqual(self.index.downstream_counts("model.dwh.a", 3), [2, 1, 0])
+        self.assertEqual(self.index.downstream_counts("model.dwh.a", 1), [2])
+        self.assertEqual(self.index.downstream_counts("model.dwh.unknown", 2), [0, 0])
+
+    def test_deep_lineage_counts_scale_linearly(self):
+        """Check counting a long chain to full depth stays cheap."""
+        size = 20_000
+        nodes = {
+            f"model.dwh.m{index}": {
+                "resource_type": "model",
+                "depends_on": {"nodes": [f"model.dwh.m{index - 1}"] if index else []},
+            }
+            for index in range(size)
+        }
+        child_map = {f"model.dwh.m{index}": [f"model.dwh.m{index + 1}"] for index in range(size - 1)}
+        index = ManifestIndex.from_manifest({"nodes": nodes, "child_map": child_map})
+
+        started = time.perf_counter()
+        counts = index.downstream_counts("model.dwh.m0", size)
+
+        self.assertEqual(sum(counts), size - 1)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+class ManifestCacheTests(unittest.TestCase):
+    def test_index_is_reused_until_manifest_changes(self):
+        """Check manifest is parsed once per path, mtime and size."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(MANIFEST), encoding="utf-8")
+
+            first = load_manifest_index(path)
+            self.assertIs(load_manifest_index(path), first)
+
+            path.write_text(json.dumps({"nodes": {}}), encoding="utf-8")
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            changed = load_manifest_index(path)
+
+        self.assertIsNot(changed, first)
+        self.assertEqual(changed.find_model("customers"), (None, None))
+
+    def test_index_file_is_shared_by_manifest_content(self):
+        """Check a second copy of the same manifest loads the stored index instead of parsing it."""
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = Path(tmp) / "index"
+            data = json.dumps(dict(MANIFEST, child_map={"model.dwh.customers": ["model.dwh.orders"]}))
+            first_path = Path(tmp) / "first" / "manifest.json"
+            second_path = Path(tmp) / "second" / "manifest.json"
+            for path in (first_path, second_path):
+                path.parent.mkdir()
+                path.write_text(data, encoding="utf-8")
+
+            first = load_manifest_index(first_path, index_dir)
+            original_parse = manifest._parse_manifest_index
+            manifest._parse_manifest_index = lambda path: self.fail(f"{path} was parsed")
+            try:
+                second = load_manifest_index(second_path, index_dir)
+            finally:
+                manifest._parse_manifest_index = original_parse
+
+            self.assertEqual(len(list(index_dir.iterdir())), 1)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(list(second.nodes), list(first.nodes))
+        self.assertEqual(second.find_model("models/core/customers.sql")[0], "model.dwh.customers")
+        self.assertEqual(second.find_test("abc123")[0], "test.dwh.unique_customers_id.abc123")
+        self.assertEqual(second.macro_ids({"star"}), ["macro.dbt_utils.star", "macro.dwh.star"])
+        self.assertEqual(second.child_map, first.child_map)
+
+    def test_concurrent_cold_loads_parse_manifest_once(self):
+        """Check callers racing on a cold cache wait for one parse instead of each parsing."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(MANIFEST), encoding="utf-8")
+            parses = []
+            original_parse = manifest._parse_manifest_index
+            barrier = threading.Barrier(8, timeout=5)
+
+            def parse(path):
+                parses.append(path)
+                return original_parse(path)
+
+            def load(_):
+                barrier.wait()
+                return load_manifest_index(path)
+
+            manifest._parse_manifest_index = parse
+            try:
+                indexes = utils.map_concurrently(load, range(8))
+            finally:
+                manifest._parse_manifest_index = original_parse
+
+        self.assertEqual(len(parses), 1)
+        self.assertTrue(all(index is indexes[0] for index in indexes))
+
+    def test_truncated_manifest_raises_json_decode_error(self):
+        """Check a truncated manifest fails with the json error callers already handle."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(MANIFEST)[:200], encoding="utf-8")
+
+            with self.assertRaises(json.JSONDecodeError):
+                load_manifest_index(path)
+
+    def test_corrupt_index_file_is_rebuilt(self):
+        """Check an unreadable index file is replaced by a parsed index."""
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = Path(tmp) / "index"
+            path = Path(tmp) / "manifest.json"
+            path.write_text(json.dumps(MANIFEST), encoding="utf-8")
+            index_dir.mkdir()
+            index_file = index_dir / f"{manifest.manifest_digest(path)}{manifest.INDEX_FILE_SUFFIX}"
+            index_file.write_bytes(b"garbage")
+
+            index = load_manifest_index(path, index_dir)
+
+            self.assertEqual(index.find_model("orders")[0], "model.dwh.orders")
+            self.assertTrue(index_file.read_bytes().startswith(manifest.INDEX_FILE_MAGIC))
+
+
+class ReferenceMemoTests(unittest.TestCase):
+    def test_memo_is_keyed_by_manifest_and_keeps_misses(self):
+        """Check memo separates manifests and remembers unresolvable references."""
+        with tempfile.TemporaryDirectory() as tmp:
+            memo = ReferenceMemo(Path(tmp) / "memo.sqlite3", max_rows=2)
+            memo.put_many("a", {"resource:customers": "models/customers.sql", "test:missing": None})
+
+            self.assertEqual(
+                memo.get_many("a", ["resource:customers", "test:missing", "resource:orders"]),
+                {"resource:customers": "models/customers.sql", "test:missing": None},
+            )
+            self.assertEqual(memo.get_many("b", ["resource:customers"]), {})
+
+            memo.put_many("b", {"resource:orders": "models/orders.sql"})
+            self.assertEqual(len(memo.get_many("a", ["resource:customers", "test:missing"])), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.rag import indexed_relevance_score
+from app.symbol_index import SymbolIndex
+
+ORDERS_SQL = (
+    "with paid_orders as (select order_id, amount from {{ ref('stg_payments') }})\n"
+    "select order_id, {{ cents_to_dollars('amount') }} as amount_usd from paid_orders"
+)
+
+
+class SymbolIndexTests(unittest.TestCase):
+    def setUp(self):
+        """Create symbol index in a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = SymbolIndex(Path(self.tmp.name) / "symbols.sqlite3", max_files=2)
+        self.reads = []
+
+    def tearDown(self):
+        """Remove temporary directory."""
+        self.tmp.cleanup()
+
+    def _source(self, text: str):
+        return lambda: self.reads.append(text) or text
+
+    def test_weights_come_from_one_batched_lookup(self):
+        """Check definitions outweigh plain identifiers and unknown symbols are absent."""
+        weights = self.index.weights(
+            {"orders": self._source(ORDERS_SQL), "other": self._source("select 1 as id")},
+            {"stg_payments", "paid_orders", "cents_to_dollars", "amount_usd", "order_id", "missing"},
+        )
+
+        self.assertEqual(
+            weights["orders"],
+            {"stg_payments": 3, "paid_orders": 3, "cents_to_dollars": 3, "amount_usd": 3, "order_id": 1},
+        )
+        self.assertEqual(weights["other"], {})
+        self.assertEqual(
+            indexed_relevance_score("orders", "models/orders.sql", weights["orders"], {"orders", "order_id", "missing"}),
+            4,
+        )
+
+    def test_each_checksum_is_indexed_once(self):
+        """Check sources are only read for checksums missing from the index."""
+        self.index.weights({"orders": self._source(ORDERS_SQL)}, {"order_id"})
+        weights = self.index.weights({"orders": self._source(ORDERS_SQL)}, {"order_id"})
+
+        self.assertEqual(self.reads, [ORDERS_SQL])
+        self.assertEqual(weights, {"orders": {"order_id": 1}})
+
+    def test_unreadable_sources_are_not_recorded(self):
+        """Check an empty read leaves the checksum out so a later readable source is indexed."""
+        self.assertEqual(self.index.weights({"orders": self._source("")}, {"order_id"}), {})
+
+        weights = self.index.weights({"orders": self._source(ORDERS_SQL)}, {"order_id"})
+
+        self.assertEqual(weights, {"orders": {"order_id": 1}})
+
+    def test_oldest_checksums_are_evicted(self):
+        """Check index keeps at most max_files checksums."""
+        for checksum in ("a", "b", "c"):
+            self.index.weights({checksum: self._source(f"select {checksum}_id")}, set())
+
+        self.index.weights({"a": self._source("select a_id"), "c": self._source("select c_id")}, set())
+
+        self.assertEqual(self.reads, ["select a_id", "select b_id", "select c_id", "select a_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
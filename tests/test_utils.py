@@ -1,10 +1,17 @@
+import asyncio
 import json
+import os
+import subprocess
 import tempfile
+import threading
 import unittest
+from concurrent.futures import Future
+from contextvars import ContextVar
 from pathlib import Path
 from types import SimpleNamespace
 
 from app import utils
+from common.config import Config, use_workspace
 
 
 class DbtLogParsingTests(unittest.TestCase):
@@ -57,7 +64,12 @@ class DbtLogParsingTests(unittest.TestCase):
                 ),
                 encoding="utf-8",
             )
-            utils.config = SimpleNamespace(dbt_project_name="jaffle_shop", repo_root=repo_root)
+            utils.config = SimpleNamespace(
+                dbt_project_name="jaffle_shop",
+                repo_root=repo_root,
+                manifest_memo=repo_root / "memo.sqlite3",
+                manifest_index_dir=repo_root / "manifest_index",
+            )
 
             self.assertEqual(
                 utils.get_error_files_from_dbt_log("Database Error in model customers"),
@@ -95,7 +107,12 @@ class DbtLogParsingTests(unittest.TestCase):
                 ),
                 encoding="utf-8",
             )
-            utils.config = SimpleNamespace(dbt_project_name="shops_dwh", repo_root=repo_root)
+            utils.config = SimpleNamespace(
+                dbt_project_name="shops_dwh",
+                repo_root=repo_root,
+                manifest_memo=repo_root / "memo.sqlite3",
+                manifest_index_dir=repo_root / "manifest_index",
+            )
 
             log = "Failure in test unique_mart_customer_360_cust_id (models/mart/_mart_layer_doc.yml)"
 
@@ -104,6 +121,51 @@ class DbtLogParsingTests(unittest.TestCase):
                 ["models/mart/mart_customer_360.sql"],
             )
 
+    def test_log_references_resolve_against_one_manifest_load_and_memo(self):
+        """Check all references of a log share one manifest load and are memoized across jobs."""
+        with tempfile.TemporaryDirectory() as tmp:
+            repo_root = Path(tmp)
+            nodes = {
+                f"model.dwh.model_{index}": {
+                    "resource_type": "model",
+                    "name": f"model_{index}",
+                    "original_file_path": f"models/model_{index}.sql",
+                }
+                for index in range(40)
+            }
+            nodes.update(
+                {
+                    f"test.dwh.not_null_model_{index}_id.abc": {
+                        "resource_type": "test",
+                        "name": f"not_null_model_{index}_id",
+                        "depends_on": {"nodes": [f"model.dwh.model_{index}"]},
+                    }
+                    for index in range(40)
+                }
+            )
+            manifest_path = repo_root / "dwh" / "target" / "manifest.json"
+            manifest_path.parent.mkdir(parents=True)
+            manifest_path.write_text(json.dumps({"nodes": nodes, "macros": {}}), encoding="utf-8")
+            utils.config = SimpleNamespace(
+                dbt_project_name="dwh",
+                repo_root=repo_root,
+                manifest_memo=repo_root / "memo.sqlite3",
+                manifest_index_dir=repo_root / "manifest_index",
+            )
+            log = "\n".join(f"Failure in test not_null_model_{index}_id (models/schema.yml)" for index in range(40))
+            loads = []
+            original_load = utils.load_manifest_index
+            utils.load_manifest_index = lambda *args: loads.append(args) or original_load(*args)
+            try:
+                first = utils.get_error_files_from_dbt_log(log)
+                second = utils.get_error_files_from_dbt_log(log)
+            finally:
+                utils.load_manifest_index = original_load
+
+        self.assertEqual(first, [f"models/model_{index}.sql" for index in range(40)])
+        self.assertEqual(second, first)
+        self.assertEqual(len(loads), 1)
+
     def test_test_failure_infers_model_from_test_name_without_manifest(self):
         """Check test failure infers model name without manifest."""
         with tempfile.TemporaryDirectory() as tmp:
@@ -143,5 +205,394 @@ class DbtLogParsingTests(unittest.TestCase):
         )
 
 
+STRUCTURED_MANIFEST = {
+    "nodes": {
+        "model.dwh.customers": {
+            "resource_type": "model",
+            "name": "customers",
+            "original_file_path": "models/core/customers.sql",
+        },
+        "test.dwh.unique_customers_id.abc": {
+            "resource_type": "test",
+            "name": "unique_customers_id",
+            "original_file_path": "models/core/_core.yml",
+            "depends_on": {"nodes": ["model.dwh.customers"]},
+        },
+        "test.dwh.assert_positive_total": {
+            "resource_type": "test",
+            "name": "assert_positive_total",
+            "original_file_path": "tests/assert_positive_total.sql",
+            "depends_on": {"nodes": []},
+        },
+    },
+    "sources": {},
+}
+
+
+class StructuredFailureTests(unittest.TestCase):
+    def setUp(self):
+        """Create checked-out project with dbt manifest."""
+        self.original_config = utils.config
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.target = root / "repo" / "dwh" / "target"
+        self.target.mkdir(parents=True)
+        (self.target / "manifest.json").write_text(json.dumps(STRUCTURED_MANIFEST), encoding="utf-8")
+        self.log = root / "dbt.log"
+        utils.config = SimpleNamespace(
+            dbt_project_name="dwh",
+            repo_root=root / "repo",
+            uploaded_dbt_log=self.log,
+            manifest_index_dir=root / "manifest_index",
+        )
+
+    def tearDown(self):
+        """Restore original utils config."""
+        utils.config = self.original_config
+        self.tmp.cleanup()
+
+    def _prepared(self, installed: list[str]):
+        """Mark job metadata as ready with installed CI artifacts."""
+        metadata = Future()
+        metadata.set_result(installed)
+        token = utils.dbt_metadata_ready.set(metadata)
+        self.addCleanup(utils.dbt_metadata_ready.reset, token)
+
+    def _write_run_results(self):
+        (self.target / "run_results.json").write_text(
+            json.dumps(
+                {
+                    "results": [
+                        {"unique_id": "model.dwh.customers", "status": "success"},
+                        {"unique_id": "test.dwh.unique_customers_id.abc", "status": "fail"},
+                        {"unique_id": "test.dwh.assert_positive_total", "status": "error"},
+                        {"unique_id": "model.dwh.unknown", "status": "error"},
+                    ]
+                }
+            ),
+            encoding="utf-8",
+        )
+
+    def test_failed_run_results_map_to_manifest_files(self):
+        """Check failed run results installed from CI resolve through manifest unique ids."""
+        self._write_run_results()
+        self._prepared(["manifest.json", "run_results.json"])
+
+        self.assertEqual(
+            utils.get_error_files_from_dbt_artifacts(),
+            ["models/core/customers.sql", "tests/assert_positive_total.sql"],
+        )
+
+    def test_run_results_not_installed_from_ci_are_ignored(self):
+        """Check a stale run_results.json in the checkout does not name failing files."""
+        self._write_run_results()
+        self._prepared([])
+        self.log.write_text("Database Error in model customers\n", encoding="utf-8")
+
+        self.assertEqual(utils.get_error_files_from_dbt_artifacts(), [])
+
+    def test_json_log_is_read_before_checkout_is_ready(self):
+        """Check JSON log failures win over run results without waiting for the checkout."""
+        self._write_run_results()
+        lines = [{"data": {"node_info": {"unique_id": "model.dwh.customers", "node_status": "error"}}}]
+        self.log.write_text("\n".join(json.dumps(line) for line in lines), encoding="utf-8")
+        original_get_failed_repo_path = utils.get_failed_repo_path
+        calls = []
+        utils.get_failed_repo_path = lambda: calls.append("checkout") or original_get_failed_repo_path()
+        try:
+            unique_ids = utils._failed_unique_ids()
+        finally:
+            utils.get_failed_repo_path = original_get_failed_repo_path
+
+        self.assertEqual(unique_ids, ["model.dwh.customers"])
+        self.assertEqual(calls, [])
+
+    def test_json_log_is_used_without_run_results(self):
+        """Check node status from JSON-format dbt log is used when run results are absent."""
+        lines = [
+            {"info": {"msg": "Running with dbt=1.8.0"}, "data": {}},
+            {"data": {"node_info": {"unique_id": "model.dwh.customers", "node_status": "success"}}},
+            {"data": {"node_info": {"unique_id": "model.dwh.customers", "node_status": "error"}}},
+        ]
+        self.log.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n", encoding="utf-8")
+
+        self.assertEqual(utils.get_error_files_from_dbt_artifacts(), ["models/core/customers.sql"])
+
+    def test_text_log_without_run_results_falls_back(self):
+        """Check text logs leave file detection to the regex scanner."""
+        self.log.write_text("Database Error in model customers\n", encoding="utf-8")
+
+        self.assertEqual(utils.get_error_files_from_dbt_artifacts(), [])
+
+
+class ContextLogTests(unittest.TestCase):
+    def setUp(self):
+        """Write a dbt log with two invocations and read it in tiny chunks."""
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.original_config = utils.config
+        self.original_chunk_size = utils.TAIL_CHUNK_SIZE
+        utils.TAIL_CHUNK_SIZE = 7
+        separator = "============================== 10:00:00.000000 | {} ==============================\n"
+        log = root / "payload_dbt.log"
+        log.write_text(
+            separator.format("inv-1")
+            + "Database Error in model orders\n\n"
+            + separator.format("inv-2")
+            + "  Database Error in model customers  \n\n"
+            + "column \"amount\" does not exist\n",
+            encoding="utf-8",
+        )
+        utils.config = SimpleNamespace(
+            uploaded_dbt_log=log,
+            context_log_max_kb=1,
+            github_repo_link="https://github.com/org/dwh.git",
+            error_ledger=root / "error_ledger.sqlite3",
+            error_ledger_ttl_days=30,
+            error_ledger_max_rows=100,
+        )
+        self.assertEqual(utils.scan_hashes(), ["inv-1", "inv-2"])
+
+    def tearDown(self):
+        """Restore utils config and chunk size."""
+        utils.config = self.original_config
+        utils.TAIL_CHUNK_SIZE = self.original_chunk_size
+        self.tmp.cleanup()
+
+    def test_returns_latest_invocation_block(self):
+        """Check only the block of the last stored hash is returned."""
+        self.assertEqual(
+            utils.get_context_log().splitlines(),
+            [
+                "============================== 10:00:00.000000 | inv-2 ==============================",
+                "Database Error in model customers",
+                "column \"amount\" does not exist",
+            ],
+        )
+
+    def test_block_larger_than_cap_keeps_its_tail(self):
+        """Check extraction stops at CONTEXT_LOG_MAX_KB and drops the partial first line."""
+        with utils.config.uploaded_dbt_log.open("a", encoding="utf-8") as f:
+            f.write("compiled sql line\n" * 200)
+
+        context_log = utils.get_context_log()
+
+        self.assertLessEqual(len(context_log), 1024)
+        self.assertNotIn("inv-2", context_log)
+        self.assertEqual(set(context_log.splitlines()), {"compiled sql line"})
+
+
+class CiArtifactTests(unittest.TestCase):
+    def setUp(self):
+        """Create temporary directory for uploaded artifacts."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        """Remove uploaded artifacts."""
+        self.tmp.cleanup()
+
+    def _artifact(self, name: str, git_sha: str = "abc123def", invocation_id: str = "inv-1") -> Path:
+        path = self.root / name
+        metadata = {"invocation_id": invocation_id, "env": {"GIT_SHA": git_sha}}
+        path.write_text(json.dumps({"metadata": metadata, "nodes": {}}), encoding="utf-8")
+        return path
+
+    def test_artifacts_from_failed_commit_and_invocation_are_valid(self):
+        """Check manifest and run results of the logged invocation are accepted."""
+        artifacts = {
+            "manifest.json": self._artifact("manifest.json"),
+            "run_results.json": self._artifact("run_results.json"),
+        }
+
+        self.assertEqual(utils.valid_ci_artifacts(artifacts, "abc123", {"inv-1"}), artifacts)
+
+    def test_artifacts_from_other_commit_or_invocation_are_rejected(self):
+        """Check stale artifacts fall back to server-side dbt parse."""
+        other_commit = {"manifest.json": self._artifact("manifest.json", git_sha="fff999")}
+        no_sha = {"manifest.json": self._artifact("manifest.json", git_sha="")}
+
+        self.assertEqual(utils.valid_ci_artifacts(other_commit, "abc123", {"inv-1"}), {})
+        self.assertEqual(utils.valid_ci_artifacts(no_sha, "abc123", {"inv-1"}), {})
+
+        artifacts = {
+            "manifest.json": self._artifact("manifest.json"),
+            "run_results.json": self._artifact("run_results.json", invocation_id="inv-0"),
+        }
+        self.assertEqual(utils.valid_ci_artifacts(artifacts, "abc123", {"inv-2"}), {})
+        self.assertEqual(
+            utils.valid_ci_artifacts(artifacts, "abc123", {"inv-1"}),
+            {"manifest.json": artifacts["manifest.json"]},
+        )
+
+
+class RepoPreparationTests(unittest.TestCase):
+    def setUp(self):
+        """Use temporary job directories and record preparation steps."""
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        (root / "repo" / "dwh").mkdir(parents=True)
+        log = root / "logs" / "payload_dbt.log"
+        log.parent.mkdir()
+        log.write_text("Database Error in model customers (models/core/customers.sql)\n", encoding="utf-8")
+
+        self.originals = {
+            name: getattr(utils, name)
+            for name in ("config", "checkout_failed_commit", "prefetch_blobs", "build_dbt_metadata")
+        }
+        utils.config = SimpleNamespace(dbt_project_name="dwh", repo_root=root / "repo", uploaded_dbt_log=log)
+        self.calls = []
+        utils.checkout_failed_commit = lambda repo, commit_hash, dbt_path: self.calls.append("checkout") or root / "repo" / "dwh"
+        utils.prefetch_blobs = lambda path, paths: self.calls.append(("prefetch", tuple(paths)))
+        utils.build_dbt_metadata = lambda *args: self.calls.append("metadata")
+
+    def tearDown(self):
+        """Restore utils functions and config."""
+        for name, value in self.originals.items():
+            setattr(utils, name, value)
+        self.tmp.cleanup()
+
+    def _run(self, steps):
+        async def scenario():
+            preparing = asyncio.ensure_future(utils.prepare_failed_repo("repo", "abc123", "dwh"))
+            try:
+                return await asyncio.to_thread(steps)
+            finally:
+                await asyncio.gather(preparing, return_exceptions=True)
+
+        with utils.track_repo_preparation():
+            return asyncio.run(scenario())
+
+    def test_readers_wait_for_checkout_and_metadata(self):
+        """Check repo and manifest readers block until background preparation reaches them."""
+        def steps():
+            repo_path = utils.get_failed_repo_path()
+            self.calls.append("repo_ready")
+            utils.wait_for_dbt_metadata()
+            self.calls.append("metadata_ready")
+            return repo_path
+
+        self.assertEqual(self._run(steps), Path(self.tmp.name) / "repo" / "dwh")
+        self.assertIn(("prefetch", ("models/core/customers.sql",)), self.calls)
+        self.assertLess(self.calls.index("checkout"), self.calls.index("repo_ready"))
+        self.assertLess(self.calls.index("metadata"), self.calls.index("metadata_ready"))
+
+    def test_checkout_failure_is_raised_in_waiting_readers(self):
+        """Check failed checkout does not leave readers blocked."""
+        def broken_checkout(*args):
+            raise RuntimeError("clone failed")
+
+        utils.checkout_failed_commit = broken_checkout
+
+        with self.assertRaisesRegex(RuntimeError, "clone failed"):
+            self._run(utils.wait_for_dbt_metadata)
+
+
+class ConcurrentMapTests(unittest.TestCase):
+    def test_results_keep_order_and_context_variables(self):
+        """Check items run together on the pool, keep input order and see caller context variables."""
+        label = ContextVar("label")
+        barrier = threading.Barrier(3, timeout=5)
+
+        def gather(item):
+            barrier.wait()
+            return f"{label.get()}:{item}"
+
+        label.set("job")
+        self.assertEqual(utils.map_concurrently(gather, ["c", "a", "b"]), ["job:c", "job:a", "job:b"])
+
+    def test_errors_are_raised_to_caller(self):
+        """Check a failing item raises in the caller."""
+        def fail(item):
+            raise ValueError(item)
+
+        with self.assertRaisesRegex(ValueError, "b"):
+            utils.map_concurrently(fail, ["b", "b"])
+
+
+class RepoWorktreeTests(unittest.TestCase):
+    def setUp(self):
+        """Use temporary home directory and real config paths."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.original_config = utils.config
+        self.original_home = os.environ.get("HOME")
+        os.environ["HOME"] = self.tmp.name
+        utils.config = Config(github_repo_link="", github_token="")
+
+    def tearDown(self):
+        """Restore home directory and utils config."""
+        utils.config = self.original_config
+        if self.original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = self.original_home
+        self.tmp.cleanup()
+
+    def _git(self, *args: str, cwd: Path) -> str:
+        return subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=cwd,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+    def _commit(self, origin: Path, content: str) -> str:
+        model = origin / "dwh" / "models" / "customers.sql"
+        model.parent.mkdir(parents=True, exist_ok=True)
+        model.write_text(content, encoding="utf-8")
+        other = origin / "docs" / "notes.md"
+        other.parent.mkdir(parents=True, exist_ok=True)
+        other.write_text(content, encoding="utf-8")
+        self._git("add", ".", cwd=origin)
+        self._git("commit", "-m", content, cwd=origin)
+        return self._git("rev-parse", "HEAD", cwd=origin)
+
+    def test_jobs_get_isolated_sparse_worktrees_from_shared_store(self):
+        """Check jobs check out their own commits sparsely over one partial store."""
+        origin = Path(self.tmp.name) / "origin" / "dwh_repo"
+        origin.mkdir(parents=True)
+        self._git("init", "-b", "main", cwd=origin)
+        self._git("config", "uploadpack.allowFilter", "true", cwd=origin)
+        self._git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=origin)
+        first_commit = self._commit(origin, "select 1 as id")
+        repo = origin.as_uri()
+
+        store = utils.sync_repo_store(repo, first_commit)
+        first_workspace = Path(self.tmp.name) / "jobs" / "first"
+        with use_workspace(first_workspace):
+            utils.add_repo_worktree(store, first_commit, "dwh")
+
+        second_commit = self._commit(origin, "select 2 as id")
+        store = utils.sync_repo_store(repo, second_commit)
+        second_workspace = Path(self.tmp.name) / "jobs" / "second"
+        with use_workspace(second_workspace):
+            utils.add_repo_worktree(store, second_commit, "dwh")
+            self.assertEqual(utils.config.uploaded_dbt_log, second_workspace / "logs" / "payload_dbt.log")
+
+        self.assertEqual(store, Path(self.tmp.name) / ".failedrepo" / "dwh_repo.git")
+        self.assertEqual(
+            (first_workspace / "repo" / "dwh" / "models" / "customers.sql").read_text(encoding="utf-8"),
+            "select 1 as id",
+        )
+        self.assertEqual(
+            (second_workspace / "repo" / "dwh" / "models" / "customers.sql").read_text(encoding="utf-8"),
+            "select 2 as id",
+        )
+
+        self.assertFalse((second_workspace / "repo" / "docs").exists())
+        self.assertEqual(self._git("config", "--get", "remote.origin.promisor", cwd=store), "true")
+        self.assertIn(
+            "select 1 as id",
+            self._git("diff", "HEAD^", "--", "dwh/models/customers.sql", cwd=second_workspace / "repo"),
+        )
+
+        with use_workspace(first_workspace):
+            utils.remove_repo_worktree(repo)
+
+        self.assertFalse((first_workspace / "repo").exists())
+        self.assertTrue((second_workspace / "repo").exists())
+
+
 if __name__ == "__main__":
     unittest.main()